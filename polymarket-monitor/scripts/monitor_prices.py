@@ -5,6 +5,7 @@ import argparse
 import json
 import sys
 import time
+from array import array
 from datetime import datetime, timezone
 
 from py_clob_client.client import ClobClient
@@ -37,10 +38,76 @@ def poll_prices(client, token_ids):
     return results
 
 
+class PriceWindow:
+    """Fixed-size ring buffer of recent prices backed by a C double array.
+
+    Keeps only the last ``size`` samples (8 bytes each) plus a running sum,
+    so the baseline mean is O(1) and memory stays flat on long runs.
+    """
+
+    __slots__ = ("_buf", "_size", "_idx", "_count", "_total")
+
+    def __init__(self, size):
+        self._buf = array("d", bytes(8 * size))
+        self._size = size
+        self._idx = 0
+        self._count = 0
+        self._total = 0.0
+
+    def mean(self):
+        """Return the mean of the buffered prices, or None if empty."""
+        if not self._count:
+            return None
+        return self._total / self._count
+
+    def push(self, price):
+        """Append a price, evicting the oldest sample once full."""
+        if self._count == self._size:
+            self._total -= self._buf[self._idx]
+        else:
+            self._count += 1
+        self._buf[self._idx] = price
+        self._total += price
+        self._idx += 1
+        if self._idx == self._size:
+            self._idx = 0
+            # Resync the running sum once per wrap to cancel float drift
+            self._total = sum(self._buf)
+
+
+def make_baseline_tracker(token_ids, baseline_window):
+    """Return ``baseline(tid, price)`` specialized for the window size.
+
+    The returned function records ``price`` and returns the baseline it is
+    compared against (None until a prior sample exists). The default
+    window of 1 just remembers the previous price per token; larger windows
+    average over a PriceWindow ring buffer.
+    """
+    if baseline_window == 1:
+        prev_price = {}
+
+        def baseline(tid, price):
+            prev = prev_price.get(tid)
+            prev_price[tid] = price
+            return prev
+
+        return baseline
+
+    windows = {tid: PriceWindow(baseline_window) for tid in token_ids}
+
+    def baseline(tid, price):
+        window = windows[tid]
+        mean = window.mean()
+        window.push(price)
+        return mean
+
+    return baseline
+
+
 def run_monitor(token_ids, interval, threshold, max_polls, baseline_window):
     """Main monitoring loop."""
     client = ClobClient(CLOB_HOST)
-    price_history = {tid: [] for tid in token_ids}
+    baseline_for = make_baseline_tracker(token_ids, baseline_window)
     poll_count = 0
 
     while True:
@@ -63,20 +130,10 @@ def run_monitor(token_ids, interval, threshold, max_polls, baseline_window):
 
             price = data["midpoint"]
             spread = data["spread"]
-            history = price_history[tid]
-            history.append(price)
+            baseline = baseline_for(tid, price)
 
             # Need at least 2 data points to compare
-            if len(history) < 2:
-                continue
-
-            # Calculate baseline from window
-            window = history[-(baseline_window + 1):-1]
-            if not window:
-                continue
-            baseline = sum(window) / len(window)
-
-            if baseline == 0:
+            if not baseline:
                 continue
 
             change_pct = ((price - baseline) / baseline) * 100
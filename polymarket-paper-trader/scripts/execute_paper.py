@@ -23,6 +23,7 @@ from paper_engine import (
     close_position,
     fetch_midpoint,
     DEFAULT_FEE_RATE,
+    _json_dumps,
 )
 
 
@@ -55,15 +56,31 @@ def execute_recommendation(
         return {"status": "rejected", "reason": "Missing token_id"}
 
     action = recommendation.get("action", "BUY").upper()
-    side = recommendation.get("side", "YES").upper()
     confidence = recommendation.get("confidence", 0.5)
-    reasoning = recommendation.get("reasoning", "")
-    strategy = recommendation.get("strategy", "unknown")
-    fee_rate = recommendation.get("fee_rate", DEFAULT_FEE_RATE)
-    price = recommendation.get("price")
 
-    # Build reasoning string
-    full_reasoning = f"[{strategy}] (conf={confidence:.0%}) {reasoning}"
+    # Confidence gate -- checked before any network I/O
+    min_confidence = 0.5
+    if confidence < min_confidence:
+        return {
+            "status": "rejected",
+            "reason": f"Confidence {confidence:.0%} below minimum {min_confidence:.0%}",
+            "recommendation": recommendation,
+        }
+
+    strategy = recommendation.get("strategy", "unknown")
+    params = {
+        "token_id": token_id,
+        "action": action,
+        "side": recommendation.get("side", "YES").upper(),
+        "confidence": confidence,
+        "strategy": strategy,
+        "fee_rate": recommendation.get("fee_rate", DEFAULT_FEE_RATE),
+        "price": recommendation.get("price"),
+        "full_reasoning": (
+            f"[{strategy}] (conf={confidence:.0%}) "
+            f"{recommendation.get('reasoning', '')}"
+        ),
+    }
 
     # Get current portfolio state
     try:
@@ -71,43 +88,63 @@ def execute_recommendation(
     except RuntimeError as exc:
         return {"status": "rejected", "reason": str(exc)}
 
-    # Confidence gate
-    min_confidence = 0.5
-    if confidence < min_confidence:
+    handler = _ACTION_HANDLERS.get(action, _handle_order)
+    return handler(recommendation, params, portfolio, portfolio_name, dry_run)
+
+
+def _handle_close(
+    recommendation: dict,
+    params: dict,
+    portfolio: dict,
+    portfolio_name: str,
+    dry_run: bool,
+) -> dict:
+    """Close an existing position (CLOSE action)."""
+    token_id = params["token_id"]
+    side = params["side"]
+    if dry_run:
         return {
-            "status": "rejected",
-            "reason": f"Confidence {confidence:.0%} below minimum {min_confidence:.0%}",
-            "recommendation": recommendation,
+            "status": "dry_run",
+            "action": "CLOSE",
+            "token_id": token_id,
+            "side": side,
+            "portfolio": _summary(portfolio),
+        }
+    try:
+        result = close_position(
+            token_id=token_id,
+            side=side if side in ("YES", "NO") else None,
+            portfolio_name=portfolio_name,
+            fee_rate=params["fee_rate"],
+            reasoning=params["full_reasoning"],
+        )
+        return {
+            "status": "executed",
+            "action": "CLOSE",
+            "result": result,
+            "portfolio": _summary(
+                get_portfolio(
+                    portfolio_name, refresh_prices=False, include_positions=False
+                )
+            ),
         }
+    except RuntimeError as exc:
+        return {"status": "rejected", "reason": str(exc)}
 
-    # Handle CLOSE action
-    if action == "CLOSE":
-        if dry_run:
-            return {
-                "status": "dry_run",
-                "action": "CLOSE",
-                "token_id": token_id,
-                "side": side,
-                "portfolio": _summary(portfolio),
-            }
-        try:
-            result = close_position(
-                token_id=token_id,
-                side=side if side in ("YES", "NO") else None,
-                portfolio_name=portfolio_name,
-                fee_rate=fee_rate,
-                reasoning=full_reasoning,
-            )
-            return {
-                "status": "executed",
-                "action": "CLOSE",
-                "result": result,
-                "portfolio": _summary(
-                    get_portfolio(portfolio_name, refresh_prices=False)
-                ),
-            }
-        except RuntimeError as exc:
-            return {"status": "rejected", "reason": str(exc)}
+
+def _handle_order(
+    recommendation: dict,
+    params: dict,
+    portfolio: dict,
+    portfolio_name: str,
+    dry_run: bool,
+) -> dict:
+    """Size and place a new order (BUY/SELL actions)."""
+    token_id = params["token_id"]
+    action = params["action"]
+    side = params["side"]
+    confidence = params["confidence"]
+    price = params["price"]
 
     # Determine size in USD
     size_usd = recommendation.get("size_usd")
@@ -148,8 +185,8 @@ def execute_recommendation(
             "limit_price": price,
             "current_price": current_price,
             "confidence": confidence,
-            "strategy": strategy,
-            "reasoning": full_reasoning,
+            "strategy": params["strategy"],
+            "reasoning": params["full_reasoning"],
             "portfolio": _summary(portfolio),
         }
 
@@ -160,12 +197,14 @@ def execute_recommendation(
             side=side,
             size=size_usd,
             price=price,
-            reasoning=full_reasoning,
+            reasoning=params["full_reasoning"],
             portfolio_name=portfolio_name,
-            fee_rate=fee_rate,
+            fee_rate=params["fee_rate"],
         )
         # Get updated portfolio
-        updated = get_portfolio(portfolio_name, refresh_prices=False)
+        updated = get_portfolio(
+            portfolio_name, refresh_prices=False, include_positions=False
+        )
         return {
             "status": "executed",
             "action": action,
@@ -185,6 +224,14 @@ def execute_recommendation(
         }
 
 
+# Action -> handler dispatch; unknown actions fall back to _handle_order
+_ACTION_HANDLERS = {
+    "CLOSE": _handle_close,
+    "BUY": _handle_order,
+    "SELL": _handle_order,
+}
+
+
 def _summary(portfolio: dict) -> dict:
     """Compact portfolio summary for trade results."""
     return {
@@ -266,7 +313,7 @@ Examples:
                 results = [execute_recommendation(rec, args.portfolio, args.dry_run)]
 
         if args.json:
-            print(json.dumps(results if len(results) > 1 else results[0], indent=2))
+            print(_json_dumps(results if len(results) > 1 else results[0]))
         else:
             for r in results:
                 status = r["status"].upper()
@@ -14,10 +14,15 @@ Performs the complete CLAUDE.md Session Start sequence in one command:
 """
 
 import argparse
+import io
 import json
 import os
 import sqlite3
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
 from urllib.request import urlopen, Request
@@ -34,11 +39,12 @@ from paper_engine import (
     DB_PATH,
     CLOB_API,
     _get_db,
+    _init_schema,
     _active_portfolio,
     _validate_token_id,
     _api_get,
-    fetch_midpoint,
 )
+from price_fetcher import get_midpoint
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -50,6 +56,12 @@ MAX_SINGLE_MARKET_PCT = 0.20  # 20%
 DAILY_LOSS_LIMIT_PCT = 0.05   # 5%
 WEEKLY_LOSS_LIMIT_PCT = 0.10  # 10%
 DEFAULT_TRAILING_STOP_PCT = 0.15  # 15% trailing stop from entry
+MAX_PRICE_FETCH_WORKERS = 8
+MAX_PRICE_AGE_SECONDS = 300  # stale prices older than this escalate to RED
+OPTIMIZE_INTERVAL_SECONDS = 3600  # run PRAGMA optimize at most hourly
+
+# Seconds a cached CLOB midpoint stays fresh; 0 disables the cache
+PRICE_CACHE_TTL = float(os.environ.get("POLYMARKET_PRICE_CACHE_TTL", "10"))
 
 # Graduated drawdown thresholds from CLAUDE.md Section 2
 DRAWDOWN_THRESHOLDS = [
@@ -77,6 +89,30 @@ DRAWDOWN_THRESHOLDS = [
 ]
 
 
+@dataclass(slots=True)
+class PositionDetail:
+    """Per-position health check row (values pre-rounded for output)."""
+
+    id: int
+    token_id: str
+    market_question: str
+    side: str
+    shares: float
+    avg_entry: float
+    current_price: float
+    value: float
+    unrealized_pnl: float
+    pnl_pct: float
+    stop_price: float
+    stop_triggered: bool
+    price_stale: bool
+    price_age_seconds: float | None
+    opened_at: str
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
 # ---------------------------------------------------------------------------
 # Live price fetching
 # ---------------------------------------------------------------------------
@@ -84,14 +120,159 @@ DRAWDOWN_THRESHOLDS = [
 def fetch_live_price(token_id: str) -> float | None:
     """
     Fetch the midpoint price for a token from the CLOB API.
+    Concurrent fetches of the same token share one request.
     Returns None on failure instead of raising.
     """
     try:
-        return fetch_midpoint(token_id)
+        return get_midpoint(token_id)
     except Exception:
         return None
 
 
+def fetch_live_prices(token_ids: list[str]) -> dict[str, float | None]:
+    """
+    Fetch midpoints for several tokens concurrently.
+
+    Returns {token_id: price}, with None for any token whose fetch failed.
+    """
+    unique_ids = list(dict.fromkeys(token_ids))
+    if not unique_ids:
+        return {}
+    workers = min(MAX_PRICE_FETCH_WORKERS, len(unique_ids))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(unique_ids, pool.map(fetch_live_price, unique_ids)))
+
+
+def load_cached_prices(
+    conn: sqlite3.Connection,
+    token_ids: list[str],
+    ttl: float = PRICE_CACHE_TTL,
+) -> dict[str, float]:
+    """Return {token_id: price} for cached midpoints fetched within ttl seconds."""
+    if ttl <= 0 or not token_ids:
+        return {}
+    placeholders = ",".join("?" * len(token_ids))
+    rows = conn.execute(
+        f"""SELECT token_id, price FROM price_cache
+            WHERE token_id IN ({placeholders}) AND fetched_at > ?""",
+        (*token_ids, time.time() - ttl),
+    ).fetchall()
+    return {row["token_id"]: row["price"] for row in rows}
+
+
+def store_cached_prices(conn: sqlite3.Connection, prices: dict[str, float]):
+    """Upsert freshly fetched midpoints into price_cache (caller commits)."""
+    fetched_at = int(time.time())
+    conn.executemany(
+        "INSERT OR REPLACE INTO price_cache (token_id, price, fetched_at) VALUES (?, ?, ?)",
+        [(tid, price, fetched_at) for tid, price in prices.items()],
+    )
+
+
+# ---------------------------------------------------------------------------
+# Database connection
+# ---------------------------------------------------------------------------
+
+_local = threading.local()
+
+
+def get_connection(db_path: str | Path) -> sqlite3.Connection:
+    """
+    Return this thread's cached connection to db_path, opening it on first use.
+
+    PRAGMAs and the schema check run only when the connection is opened,
+    so repeated health checks in one process skip the setup cost.
+    """
+    key = str(db_path)
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(key)
+    if conn is None:
+        conn = sqlite3.connect(key)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=5000")   # wait out concurrent writers
+        conn.execute("PRAGMA synchronous=NORMAL")  # safe with WAL, fewer fsyncs
+        conn.execute("PRAGMA foreign_keys=ON")
+        _init_schema(conn)  # ensures idx_trades_pf_ts on older databases
+        conns[key] = conn
+    return conn
+
+
+def query_realized_pnl(
+    conn: sqlite3.Connection,
+    pid: int,
+    today: str,
+    tomorrow: str,
+    last_monday: str,
+) -> tuple[float, float]:
+    """
+    Return (daily, weekly) realized P&L from SELL/CLOSE trades.
+
+    Both sums come from a single pass over trades. executed_at is ISO-8601,
+    so plain string ranges on the raw column match date() semantics while
+    letting idx_trades_pf_ts seek.
+
+    P&L is before fees, the same figure paper_engine's daily loss check
+    uses: realized_pnl + fee on SELLs, (price - entry_avg) * shares on rows
+    without a recorded realized_pnl.
+    """
+    row = conn.execute(
+        """SELECT
+            COALESCE(SUM(
+                CASE WHEN executed_at >= ? AND executed_at < ?
+                     THEN COALESCE(realized_pnl + fee,
+                                   (price - entry_avg) * shares)
+                     ELSE 0 END
+            ), 0) as daily_realized,
+            COALESCE(SUM(COALESCE(realized_pnl + fee,
+                                  (price - entry_avg) * shares)), 0)
+                as weekly_realized
+        FROM trades
+        WHERE portfolio_id = ? AND executed_at >= ?
+          AND action IN ('SELL','CLOSE') AND entry_avg IS NOT NULL""",
+        (today, tomorrow, pid, last_monday),
+    ).fetchone()
+    if not row:
+        return 0.0, 0.0
+    return row["daily_realized"], row["weekly_realized"]
+
+
+def _age_seconds(timestamp: str | None, now_dt: datetime) -> float | None:
+    """Seconds elapsed since an ISO-8601 timestamp, or None if unparseable."""
+    if not timestamp:
+        return None
+    try:
+        then = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if then.tzinfo is None:
+        then = then.replace(tzinfo=timezone.utc)
+    return round((now_dt - then).total_seconds(), 1)
+
+
+def maybe_optimize(conn: sqlite3.Connection, db_path: Path):
+    """
+    Run PRAGMA optimize if it has not run in the last hour.
+
+    Keeps planner statistics current as trades grows. The last run is
+    tracked by the mtime of a stamp file next to the database.
+    """
+    stamp = db_path.with_name(db_path.name + ".optimized")
+    try:
+        last_run = stamp.stat().st_mtime
+    except OSError:
+        last_run = 0.0
+    if time.time() - last_run < OPTIMIZE_INTERVAL_SECONDS:
+        return
+    try:
+        conn.execute("PRAGMA optimize")
+        stamp.touch()
+    except (sqlite3.Error, OSError):
+        pass  # best effort; never fail a health check over maintenance
+
+
 # ---------------------------------------------------------------------------
 # Core health check logic
 # ---------------------------------------------------------------------------
@@ -117,10 +298,7 @@ def run_health_check(
             f"Run: python paper_engine.py --action init"
         )
 
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    conn.execute("PRAGMA foreign_keys=ON")
+    conn = get_connection(db_path)
 
     try:
         # ---------------------------------------------------------------
@@ -136,71 +314,105 @@ def run_health_check(
         # 2-3. Fetch live prices and update DB for each open position
         # ---------------------------------------------------------------
         positions_rows = conn.execute(
-            "SELECT * FROM positions WHERE portfolio_id = ? AND closed = 0",
+            "SELECT id, token_id FROM positions WHERE portfolio_id = ? AND closed = 0",
             (pid,),
         ).fetchall()
 
-        now_iso = datetime.now(timezone.utc).isoformat()
-        positions = []
+        # One instant for every timestamp and date boundary in this check,
+        # so "today" cannot roll over mid-run at midnight UTC
+        now_dt = datetime.now(timezone.utc)
+        now_iso = now_dt.isoformat()
+        today = now_dt.strftime("%Y-%m-%d")
+        tomorrow = (now_dt + timedelta(days=1)).strftime("%Y-%m-%d")
+        last_monday = (now_dt - timedelta(days=now_dt.weekday())).strftime("%Y-%m-%d")
         price_errors = []
 
-        for row in positions_rows:
-            p = dict(row)
-            token_id = p["token_id"]
+        # Serve recent midpoints from the TTL cache; fetch only the rest.
+        # The realized-P&L query (step 7) runs on this thread while the
+        # HTTP fetches are in flight on the pool.
+        token_ids = list(dict.fromkeys(row[1] for row in positions_rows))
+        live_prices = load_cached_prices(conn, token_ids)
+        missing = [tid for tid in token_ids if tid not in live_prices]
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            price_future = pool.submit(fetch_live_prices, missing)
+            daily_realized, weekly_realized = query_realized_pnl(
+                conn, pid, today, tomorrow, last_monday
+            )
+            fetched = {
+                tid: price
+                for tid, price in price_future.result().items()
+                if price is not None
+            }
+        live_prices.update(fetched)
+
+        price_updates = []
 
-            live_price = fetch_live_price(token_id)
+        for pos_id, token_id in positions_rows:
+            live_price = live_prices.get(token_id)
             if live_price is not None:
-                p["current_price"] = live_price
-                conn.execute(
-                    "UPDATE positions SET current_price = ?, updated_at = ? WHERE id = ?",
-                    (live_price, now_iso, p["id"]),
-                )
+                price_updates.append((live_price, now_iso, pos_id))
             else:
                 price_errors.append(token_id)
                 # Keep stale price from DB
 
-            positions.append(p)
-
-        conn.commit()
+        if price_updates:
+            # One write transaction for all price, cache and peak updates;
+            # committed once at the end of the check
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE positions SET current_price = ?, updated_at = ? WHERE id = ?",
+                price_updates,
+            )
+            if fetched and PRICE_CACHE_TTL > 0:
+                store_cached_prices(conn, fetched)
 
         # ---------------------------------------------------------------
         # 4. Per-position P&L and stop-loss status
         # ---------------------------------------------------------------
-        position_details = []
-        positions_value = 0.0
-
-        for p in positions:
-            shares = p["shares"]
-            entry = p["avg_entry"]
-            current = p["current_price"]
-            value = shares * current
-            unrealized_pnl = (current - entry) * shares
-            pnl_pct = ((current - entry) / entry * 100) if entry > 0 else 0.0
-
-            # Stop-loss: default 15% trailing from entry
-            # (CLAUDE.md says stop_loss = entry_price - edge/2, but we
-            # don't store edge, so use 15% trailing stop from entry)
-            stop_price = entry * (1 - DEFAULT_TRAILING_STOP_PCT)
-            stop_triggered = current <= stop_price
-
-            position_details.append({
-                "id": p["id"],
-                "token_id": p["token_id"],
-                "market_question": p["market_question"] or "Unknown",
-                "side": p["side"],
-                "shares": round(shares, 4),
-                "avg_entry": round(entry, 6),
-                "current_price": round(current, 6),
-                "value": round(value, 4),
-                "unrealized_pnl": round(unrealized_pnl, 4),
-                "pnl_pct": round(pnl_pct, 2),
-                "stop_price": round(stop_price, 6),
-                "stop_triggered": stop_triggered,
-                "price_stale": p["token_id"] in price_errors,
-                "opened_at": p["opened_at"],
-            })
+        # Value, P&L and stop levels are computed by SQLite from the
+        # just-updated current_price (stale rows keep their stored price).
+        # Stop-loss: default 15% trailing from entry
+        # (CLAUDE.md says stop_loss = entry_price - edge/2, but we
+        # don't store edge, so use 15% trailing stop from entry)
+        stop_multiplier = 1 - DEFAULT_TRAILING_STOP_PCT
+        detail_rows = conn.execute(
+            """SELECT id, token_id, market_question, side, shares, avg_entry,
+                      current_price, opened_at, updated_at,
+                      shares * current_price AS value,
+                      (current_price - avg_entry) * shares AS unrealized_pnl,
+                      CASE WHEN avg_entry > 0
+                           THEN (current_price - avg_entry) / avg_entry * 100
+                           ELSE 0.0 END AS pnl_pct,
+                      avg_entry * ? AS stop_price,
+                      current_price <= avg_entry * ? AS stop_triggered
+               FROM positions WHERE portfolio_id = ? AND closed = 0""",
+            (stop_multiplier, stop_multiplier, pid),
+        ).fetchall()
 
-            positions_value += value
+        stale_tokens = set(price_errors)
+        position_details = [
+            PositionDetail(
+                id=pos_id,
+                token_id=token_id,
+                market_question=market_question or "Unknown",
+                side=side,
+                shares=round(shares, 4),
+                avg_entry=round(entry, 6),
+                current_price=round(current, 6),
+                value=round(value, 4),
+                unrealized_pnl=round(unrealized_pnl, 4),
+                pnl_pct=round(pnl_pct, 2),
+                stop_price=round(stop_price, 6),
+                stop_triggered=bool(stop_triggered),
+                price_stale=token_id in stale_tokens,
+                price_age_seconds=_age_seconds(updated_at, now_dt),
+                opened_at=opened_at,
+            )
+            for (pos_id, token_id, market_question, side, shares, entry,
+                 current, opened_at, updated_at, value, unrealized_pnl,
+                 pnl_pct, stop_price, stop_triggered) in detail_rows
+        ]
+        positions_value = sum(row["value"] for row in detail_rows)
 
         # ---------------------------------------------------------------
         # 5. Portfolio-level metrics
@@ -209,6 +421,14 @@ def run_health_check(
         overall_pnl = total_value - starting_balance
         overall_pnl_pct = (overall_pnl / starting_balance * 100) if starting_balance > 0 else 0.0
 
+        # Keep the maintained portfolios.positions_value in step with
+        # the refreshed prices
+        if price_updates:
+            conn.execute(
+                "UPDATE portfolios SET positions_value = ? WHERE id = ?",
+                (positions_value, pid),
+            )
+
         # Update peak if we have a new high
         if total_value > peak_value:
             peak_value = total_value
@@ -216,14 +436,12 @@ def run_health_check(
                 "UPDATE portfolios SET peak_value = ?, updated_at = ? WHERE id = ?",
                 (peak_value, now_iso, pid),
             )
-            conn.commit()
 
         # Drawdown from peak
         drawdown_usd = peak_value - total_value
         drawdown_pct = (drawdown_usd / peak_value * 100) if peak_value > 0 else 0.0
 
         # Daily P&L: compare to yesterday's snapshot or starting balance
-        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
         prev_snapshot = conn.execute(
             """SELECT total_value FROM daily_snapshots
                WHERE portfolio_id = ? AND date < ?
@@ -239,21 +457,19 @@ def run_health_check(
 
         # Single market concentration: max exposure to any one token_id
         exposure_by_token = {}
+        token_to_market = {}
         for p in position_details:
-            tid = p["token_id"]
-            exposure_by_token[tid] = exposure_by_token.get(tid, 0.0) + p["value"]
+            tid = p.token_id
+            exposure_by_token[tid] = exposure_by_token.get(tid, 0.0) + p.value
+            token_to_market.setdefault(tid, p.market_question)
 
         max_concentration = 0.0
         max_concentration_market = ""
-        for tid, exp in exposure_by_token.items():
-            pct = (exp / total_value) if total_value > 0 else 0.0
-            if pct > max_concentration:
-                max_concentration = pct
-                # Look up market name
-                for p in position_details:
-                    if p["token_id"] == tid:
-                        max_concentration_market = p["market_question"]
-                        break
+        if exposure_by_token and total_value > 0:
+            tid, exp = max(exposure_by_token.items(), key=lambda kv: kv[1])
+            if exp > 0:
+                max_concentration = exp / total_value
+                max_concentration_market = token_to_market[tid]
 
         # ---------------------------------------------------------------
         # 6. Graduated drawdown thresholds
@@ -262,47 +478,22 @@ def run_health_check(
         drawdown_tier = "NONE"
         drawdown_action = None
 
-        for threshold in DRAWDOWN_THRESHOLDS:
+        # Thresholds are ascending; the first match from the top is the tier
+        for threshold in reversed(DRAWDOWN_THRESHOLDS):
             if drawdown_fraction >= threshold["level"]:
                 drawdown_tier = threshold["tier"]
                 drawdown_action = threshold["action"]
+                break
 
         # ---------------------------------------------------------------
         # 7. Daily and weekly loss limits
         # ---------------------------------------------------------------
 
-        # Daily realized losses from SELL/CLOSE trades today
-        daily_realized_row = conn.execute(
-            """SELECT COALESCE(SUM(
-                CASE WHEN action IN ('SELL','CLOSE') AND entry_avg IS NOT NULL
-                     THEN (price - entry_avg) * shares
-                     ELSE 0 END
-            ), 0) as realized
-            FROM trades
-            WHERE portfolio_id = ? AND date(executed_at) = ?""",
-            (pid, today),
-        ).fetchone()
-        daily_realized = daily_realized_row["realized"] if daily_realized_row else 0.0
+        # daily_realized / weekly_realized were queried during the price fetch
         daily_loss = abs(min(0, daily_realized))
         daily_loss_limit = starting_balance * DAILY_LOSS_LIMIT_PCT
         daily_loss_breached = daily_loss >= daily_loss_limit
 
-        # Weekly realized losses (since last Monday)
-        now_dt = datetime.now(timezone.utc)
-        days_since_monday = now_dt.weekday()  # Monday=0
-        last_monday = (now_dt - timedelta(days=days_since_monday)).strftime("%Y-%m-%d")
-
-        weekly_realized_row = conn.execute(
-            """SELECT COALESCE(SUM(
-                CASE WHEN action IN ('SELL','CLOSE') AND entry_avg IS NOT NULL
-                     THEN (price - entry_avg) * shares
-                     ELSE 0 END
-            ), 0) as realized
-            FROM trades
-            WHERE portfolio_id = ? AND date(executed_at) >= ?""",
-            (pid, last_monday),
-        ).fetchone()
-        weekly_realized = weekly_realized_row["realized"] if weekly_realized_row else 0.0
         weekly_loss = abs(min(0, weekly_realized))
         weekly_loss_limit = starting_balance * WEEKLY_LOSS_LIMIT_PCT
         weekly_loss_breached = weekly_loss >= weekly_loss_limit
@@ -314,15 +505,15 @@ def run_health_check(
         overall_status = "GREEN"
 
         # Stop-loss alerts
-        stops_triggered = [p for p in position_details if p["stop_triggered"]]
+        stops_triggered = [p for p in position_details if p.stop_triggered]
         for p in stops_triggered:
             alerts.append({
                 "severity": "HIGH",
                 "type": "STOP_LOSS",
                 "message": (
-                    f"Stop-loss triggered for {p['side']} position in "
-                    f"'{p['market_question'][:60]}': "
-                    f"current ${p['current_price']:.4f} <= stop ${p['stop_price']:.4f}"
+                    f"Stop-loss triggered for {p.side} position in "
+                    f"'{p.market_question[:60]}': "
+                    f"current ${p.current_price:.4f} <= stop ${p.stop_price:.4f}"
                 ),
             })
             overall_status = "RED"
@@ -340,6 +531,26 @@ def run_health_check(
             if overall_status == "GREEN":
                 overall_status = "YELLOW"
 
+        # A stale price is tolerable briefly; one that has not refreshed
+        # for MAX_PRICE_AGE_SECONDS makes P&L and stop checks unreliable
+        expired = [
+            p for p in position_details
+            if p.price_stale and p.price_age_seconds is not None
+            and p.price_age_seconds > MAX_PRICE_AGE_SECONDS
+        ]
+        if expired:
+            oldest = max(p.price_age_seconds for p in expired)
+            alerts.append({
+                "severity": "HIGH",
+                "type": "STALE_PRICE_EXPIRED",
+                "message": (
+                    f"Prices for {len(expired)} position(s) not refreshed for over "
+                    f"{MAX_PRICE_AGE_SECONDS // 60} minutes (oldest: {oldest / 60:.0f}m). "
+                    f"P&L and stop-loss status may be wrong."
+                ),
+            })
+            overall_status = "RED"
+
         # Drawdown alerts
         if drawdown_tier == "WARN":
             alerts.append({
@@ -470,10 +681,15 @@ def run_health_check(
             "alerts": alerts,
         }
 
+        if conn.in_transaction:
+            conn.commit()
         return result
 
     finally:
-        conn.close()
+        # Connection is reused across calls; never leave a write open
+        if conn.in_transaction:
+            conn.rollback()
+        maybe_optimize(conn, db_path)
 
 
 # ---------------------------------------------------------------------------
@@ -493,109 +709,103 @@ def format_human_readable(result: dict) -> str:
         "RED": "[RED]    Action required -- review alerts below",
     }
 
-    lines = [
-        "=" * 64,
-        f"  PORTFOLIO HEALTH CHECK",
-        f"  {result['checked_at'][:19]} UTC",
-        f"  Status: {status_bar.get(status, status)}",
-        "=" * 64,
-        "",
-        "--- Portfolio Overview ---",
-        f"  Starting Balance:   ${pf['starting_balance']:>12,.2f}",
-        f"  Cash:               ${pf['cash_balance']:>12,.2f}",
-        f"  Positions Value:    ${pf['positions_value']:>12,.2f}",
-        f"  Total Value:        ${pf['total_value']:>12,.2f}",
-        f"  P&L:                ${pf['pnl']:>12,.2f} ({pf['pnl_pct']:+.2f}%)",
-        f"  Peak Value:         ${pf['peak_value']:>12,.2f}",
-        f"  Drawdown:           ${pf['drawdown_usd']:>12,.2f} ({pf['drawdown_pct']:.2f}%)",
-        f"  Daily P&L:          ${pf['daily_pnl']:>12,.2f} ({pf['daily_pnl_pct']:+.2f}%)",
-    ]
+    buf = io.StringIO()
+    w = buf.write
+    rule = "=" * 64
+
+    w(f"{rule}\n")
+    w("  PORTFOLIO HEALTH CHECK\n")
+    w(f"  {result['checked_at'][:19]} UTC\n")
+    w(f"  Status: {status_bar.get(status, status)}\n")
+    w(f"{rule}\n")
+    w("\n")
+    w("--- Portfolio Overview ---\n")
+    w(f"  Starting Balance:   ${pf['starting_balance']:>12,.2f}\n")
+    w(f"  Cash:               ${pf['cash_balance']:>12,.2f}\n")
+    w(f"  Positions Value:    ${pf['positions_value']:>12,.2f}\n")
+    w(f"  Total Value:        ${pf['total_value']:>12,.2f}\n")
+    w(f"  P&L:                ${pf['pnl']:>12,.2f} ({pf['pnl_pct']:+.2f}%)\n")
+    w(f"  Peak Value:         ${pf['peak_value']:>12,.2f}\n")
+    w(f"  Drawdown:           ${pf['drawdown_usd']:>12,.2f} ({pf['drawdown_pct']:.2f}%)\n")
+    w(f"  Daily P&L:          ${pf['daily_pnl']:>12,.2f} ({pf['daily_pnl_pct']:+.2f}%)\n")
 
     # --- Positions ---
+    w("\n")
+    w("--- Open Positions ---\n")
     if result["positions"]:
-        lines.append("")
-        lines.append("--- Open Positions ---")
-        lines.append(
+        w(
             f"  {'Side':>4} {'Shares':>8} {'Entry':>8} {'Current':>8} "
-            f"{'P&L':>10} {'P&L%':>7} {'Stop':>8} {'Status':>8}"
+            f"{'P&L':>10} {'P&L%':>7} {'Stop':>8} {'Status':>8}\n"
         )
-        lines.append("  " + "-" * 74)
+        w("  " + "-" * 74 + "\n")
 
         for p in result["positions"]:
-            stop_status = "STOP!" if p["stop_triggered"] else "OK"
-            stale = " [stale]" if p["price_stale"] else ""
-            lines.append(
-                f"  {p['side']:>4} {p['shares']:>8.2f} "
-                f"${p['avg_entry']:>.4f} ${p['current_price']:>.4f} "
-                f"${p['unrealized_pnl']:>+9,.2f} {p['pnl_pct']:>+6.1f}% "
-                f"${p['stop_price']:>.4f} {stop_status:>8}{stale}"
+            stop_status = "STOP!" if p.stop_triggered else "OK"
+            stale = " [stale]" if p.price_stale else ""
+            w(
+                f"  {p.side:>4} {p.shares:>8.2f} "
+                f"${p.avg_entry:>.4f} ${p.current_price:>.4f} "
+                f"${p.unrealized_pnl:>+9,.2f} {p.pnl_pct:>+6.1f}% "
+                f"${p.stop_price:>.4f} {stop_status:>8}{stale}\n"
             )
             # Market question on its own line
-            lines.append(f"       {p['market_question'][:60]}")
+            w(f"       {p.market_question[:60]}\n")
     else:
-        lines.append("")
-        lines.append("--- Open Positions ---")
-        lines.append("  No open positions.")
+        w("  No open positions.\n")
 
     # --- Risk Utilization ---
-    lines.append("")
-    lines.append("--- Risk Utilization ---")
-    lines.append(
-        f"  Positions:          {risk['position_utilization']:>12}"
-    )
-    lines.append(
+    w("\n")
+    w("--- Risk Utilization ---\n")
+    w(f"  Positions:          {risk['position_utilization']:>12}\n")
+    w(
         f"  Max Concentration:  {risk['max_concentration_pct']:>11.1f}% "
-        f"(limit: {risk['concentration_limit_pct']:.0f}%)"
+        f"(limit: {risk['concentration_limit_pct']:.0f}%)\n"
     )
     if risk["max_concentration_market"] != "N/A":
-        lines.append(
-            f"    in: {risk['max_concentration_market']}"
-        )
-    lines.append(
-        f"  Drawdown Tier:      {risk['drawdown_tier']:>12}"
-    )
+        w(f"    in: {risk['max_concentration_market']}\n")
+    w(f"  Drawdown Tier:      {risk['drawdown_tier']:>12}\n")
     if risk["drawdown_action"]:
-        lines.append(f"    Action: {risk['drawdown_action']}")
-    lines.append(
+        w(f"    Action: {risk['drawdown_action']}\n")
+    w(
         f"  Daily Loss:         ${risk['daily_loss']:>11,.2f} / "
         f"${risk['daily_loss_limit']:,.2f} "
-        f"({risk['daily_loss_pct']:.1f}% / {DAILY_LOSS_LIMIT_PCT*100:.0f}%)"
+        f"({risk['daily_loss_pct']:.1f}% / {DAILY_LOSS_LIMIT_PCT*100:.0f}%)\n"
     )
-    lines.append(
+    w(
         f"  Weekly Loss:        ${risk['weekly_loss']:>11,.2f} / "
         f"${risk['weekly_loss_limit']:,.2f} "
-        f"({risk['weekly_loss_pct']:.1f}% / {WEEKLY_LOSS_LIMIT_PCT*100:.0f}%)"
-    )
-    lines.append(
-        f"  Stops Triggered:    {risk['stops_triggered']:>12}"
+        f"({risk['weekly_loss_pct']:.1f}% / {WEEKLY_LOSS_LIMIT_PCT*100:.0f}%)\n"
     )
+    w(f"  Stops Triggered:    {risk['stops_triggered']:>12}\n")
 
     # --- Alerts ---
+    w("\n")
+    w("--- Alerts ---\n")
     if result["alerts"]:
-        lines.append("")
-        lines.append("--- Alerts ---")
         for alert in result["alerts"]:
-            severity = alert["severity"]
-            lines.append(f"  [{severity}] {alert['message']}")
+            w(f"  [{alert['severity']}] {alert['message']}\n")
     else:
-        lines.append("")
-        lines.append("--- Alerts ---")
-        lines.append("  None. All risk checks passed.")
-
-    lines.append("")
-    lines.append("=" * 64)
-    lines.append(
-        f"  OVERALL STATUS: {status}"
-    )
-    lines.append("=" * 64)
+        w("  None. All risk checks passed.\n")
 
-    return "\n".join(lines)
+    w("\n")
+    w(f"{rule}\n")
+    w(f"  OVERALL STATUS: {status}\n")
+    w(rule)
+
+    return buf.getvalue()
 
 
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
 
+def _json_default(obj):
+    """json.dumps hook: serialize PositionDetail rows."""
+    if isinstance(obj, PositionDetail):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Portfolio health check — automated Session Start workflow",
@@ -644,7 +854,12 @@ Examples:
         )
 
         if args.json:
-            print(json.dumps(result, indent=2))
+            # Pretty-print for a terminal; compact when piped to another tool
+            if sys.stdout.isatty():
+                print(json.dumps(result, indent=2, default=_json_default))
+            else:
+                print(json.dumps(result, separators=(",", ":"),
+                                 default=_json_default))
         else:
             print(format_human_readable(result))
 
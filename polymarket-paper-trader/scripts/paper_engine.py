@@ -9,14 +9,48 @@ Fetches real prices from the CLOB and Gamma APIs.
 
 import argparse
 import json
+import math
 import os
 import sqlite3
 import sys
+import threading
 import time
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+from operator import itemgetter
 from pathlib import Path
-from urllib.request import urlopen, Request
-from urllib.error import URLError, HTTPError
+from urllib.parse import urlsplit
+
+
+def _has_non_finite(obj) -> bool:
+    """True if obj contains an inf or NaN float anywhere."""
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(_has_non_finite(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_has_non_finite(v) for v in obj)
+    return False
+
+
+# Optional faster JSON codec: the decoder for API responses (both accept
+# raw bytes) and the encoder for indented --json CLI output.
+try:
+    import orjson
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj) -> str:
+        """Indented JSON text for CLI output."""
+        # orjson writes inf/NaN as null, which would turn e.g. an all-winner
+        # profit_factor into "unknown"; keep json's Infinity/NaN for those.
+        if _has_non_finite(obj):
+            return json.dumps(obj, indent=2, default=str)
+        return orjson.dumps(obj, default=str, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(obj) -> str:
+        """Indented JSON text for CLI output."""
+        return json.dumps(obj, indent=2, default=str)
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -27,6 +61,9 @@ DB_PATH = DB_DIR / "portfolio.db"
 GAMMA_API = "https://gamma-api.polymarket.com"
 CLOB_API = "https://clob.polymarket.com"
 DEFAULT_BALANCE = 1000.0
+MAX_FETCH_WORKERS = 8  # concurrent CLOB requests when refreshing prices
+MARKET_CACHE_TTL = 3600  # seconds; market metadata is effectively static
+RISK_PRICE_MAX_AGE = 30  # seconds; place_order reuses stored prices this fresh
 
 # Risk defaults (overridable per-portfolio)
 DEFAULT_RISK = {
@@ -44,13 +81,18 @@ DEFAULT_RISK = {
 DEFAULT_FEE_RATE = 0.0
 
 # Token ID format: numeric string, typically 50-100 digits
-import re
-_TOKEN_ID_RE = re.compile(r"^\d{20,120}$")
+_TOKEN_ID_MIN_LEN = 20
+_TOKEN_ID_MAX_LEN = 120
 
 
 def _validate_token_id(token_id: str) -> str:
     """Validate a CLOB token ID before using it in URLs."""
-    if not isinstance(token_id, str) or not _TOKEN_ID_RE.match(token_id):
+    if not (
+        isinstance(token_id, str)
+        and _TOKEN_ID_MIN_LEN <= len(token_id) <= _TOKEN_ID_MAX_LEN
+        and token_id.isascii()
+        and token_id.isdigit()
+    ):
         raise ValueError(
             f"Invalid token ID format: must be 20-120 digits, got: {token_id!r}"
         )
@@ -61,14 +103,113 @@ def _validate_token_id(token_id: str) -> str:
 # HTTP helpers
 # ---------------------------------------------------------------------------
 
+_HTTP_HEADERS = {
+    "User-Agent": "polymarket-paper-trader/1.0",
+    "Connection": "keep-alive",
+}
+
+HTTP_POOL_MAXSIZE = 16  # idle keep-alive connections kept per host
+
+# Process-wide pool of idle keep-alive HTTPS connections, keyed by host.
+# A connection is checked out by one thread at a time (http.client
+# connections are not thread-safe), so short-lived worker threads from
+# fetch_midpoints reuse the same sockets and TLS sessions as the caller.
+#
+# http.client, ssl and the TLS context (which loads the CA store) are only
+# set up on the first request, so offline actions such as init, trades
+# and reports don't pay for them at startup.
+_ssl_context = None
+_http_pool: dict[str, list["http.client.HTTPSConnection"]] = {}
+_http_pool_lock = threading.Lock()
+
+
+def _checkout_connection(host: str, timeout: int) -> "http.client.HTTPSConnection":
+    """Take an idle connection to host from the pool, or open a new one."""
+    global _ssl_context
+    import http.client
+    with _http_pool_lock:
+        idle = _http_pool.get(host)
+        conn = idle.pop() if idle else None
+    if conn is None:
+        if _ssl_context is None:
+            import ssl
+            _ssl_context = ssl.create_default_context()
+        return http.client.HTTPSConnection(
+            host, timeout=timeout, context=_ssl_context
+        )
+    conn.timeout = timeout
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout)
+    return conn
+
+
+def _checkin_connection(host: str, conn: "http.client.HTTPSConnection"):
+    """Return a connection to the pool, closing it if the pool is full."""
+    with _http_pool_lock:
+        idle = _http_pool.setdefault(host, [])
+        if len(idle) < HTTP_POOL_MAXSIZE:
+            idle.append(conn)
+            return
+    conn.close()
+
+
+class _APIError(RuntimeError):
+    """An API request failed; status is the HTTP status, or None if no response."""
+
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+
+def _api_request(
+    method: str,
+    url: str,
+    payload: dict | list | None = None,
+    timeout: int = 15,
+) -> dict | list:
+    """Send a request over a pooled keep-alive connection. Returns parsed JSON."""
+    import http.client
+    parts = urlsplit(url)
+    host = parts.netloc
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    headers = _HTTP_HEADERS
+    body = None
+    if payload is not None:
+        body = json.dumps(payload).encode()
+        headers = {**_HTTP_HEADERS, "Content-Type": "application/json"}
+    # A pooled connection may have been closed by the server while idle;
+    # retry once on a fresh connection before giving up.
+    for attempt in range(2):
+        conn = _checkout_connection(host, timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+        except (OSError, http.client.HTTPException) as exc:
+            conn.close()
+            if attempt == 0:
+                continue
+            raise _APIError(f"API request failed: {url} — {exc}") from exc
+        if resp.will_close:
+            conn.close()
+        else:
+            _checkin_connection(host, conn)
+        if resp.status >= 400:
+            raise _APIError(
+                f"API request failed: {url} — HTTP Error {resp.status}: {resp.reason}",
+                resp.status,
+            )
+        return _json_loads(data)
+
+
 def _api_get(url: str, timeout: int = 15) -> dict | list:
     """GET JSON from a URL. Returns parsed JSON."""
-    req = Request(url, headers={"User-Agent": "polymarket-paper-trader/1.0"})
-    try:
-        with urlopen(req, timeout=timeout) as resp:
-            return json.loads(resp.read().decode())
-    except (URLError, HTTPError) as exc:
-        raise RuntimeError(f"API request failed: {url} — {exc}") from exc
+    return _api_request("GET", url, timeout=timeout)
+
+
+def _api_post(url: str, payload: dict | list, timeout: int = 15) -> dict | list:
+    """POST a JSON body to a URL. Returns parsed JSON."""
+    return _api_request("POST", url, payload, timeout=timeout)
 
 
 def fetch_orderbook(token_id: str) -> dict:
@@ -84,6 +225,75 @@ def fetch_midpoint(token_id: str) -> float:
     return float(data["mid"])
 
 
+def _try_fetch_midpoint(token_id: str) -> float | None:
+    try:
+        return fetch_midpoint(token_id)
+    except Exception:
+        return None
+
+
+# Cleared once POST /midpoints proves unsupported (404/405 or an unexpected
+# payload), so later refreshes in this process go straight to the per-token
+# fan-out. Transient failures (timeouts, 429, 5xx) only pause bulk fetching
+# until _bulk_midpoints_retry_at (time.monotonic()).
+_bulk_midpoints_ok = True
+_bulk_midpoints_retry_at = 0.0
+BULK_MIDPOINTS_RETRY_AFTER = 60  # seconds
+
+
+def _fetch_midpoints_bulk(token_ids: list[str]) -> dict[str, float]:
+    """Fetch midpoints for many tokens in one POST /midpoints request."""
+    data = _api_post(
+        f"{CLOB_API}/midpoints",
+        [{"token_id": _validate_token_id(tid)} for tid in token_ids],
+    )
+    if not isinstance(data, dict):
+        raise RuntimeError(f"Unexpected /midpoints response: {data!r:.200}")
+    prices = {}
+    for tid in token_ids:
+        try:
+            prices[tid] = float(data[tid])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return prices
+
+
+def fetch_midpoints(token_ids: list[str]) -> dict[str, float]:
+    """
+    Fetch midpoints for several tokens.
+
+    Uses the CLOB's bulk POST /midpoints endpoint (one round trip for all
+    tokens), falling back to concurrent per-token GETs if that fails.
+    Returns {token_id: price} for the tokens that fetched successfully;
+    failed tokens are omitted so callers can keep their stale price.
+    """
+    global _bulk_midpoints_ok, _bulk_midpoints_retry_at
+    unique_ids = list(dict.fromkeys(token_ids))
+    if not unique_ids:
+        return {}
+    if (_bulk_midpoints_ok and len(unique_ids) > 1
+            and time.monotonic() >= _bulk_midpoints_retry_at):
+        try:
+            return _fetch_midpoints_bulk(unique_ids)
+        except _APIError as exc:
+            if exc.status in (404, 405):
+                _bulk_midpoints_ok = False
+            else:
+                _bulk_midpoints_retry_at = (
+                    time.monotonic() + BULK_MIDPOINTS_RETRY_AFTER
+                )
+        except RuntimeError:
+            _bulk_midpoints_ok = False  # unexpected /midpoints payload
+        except ValueError:
+            pass  # malformed token ID; the fan-out below skips just that one
+    from concurrent.futures import ThreadPoolExecutor
+
+    workers = min(MAX_FETCH_WORKERS, len(unique_ids))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        prices = dict(zip(unique_ids, pool.map(_try_fetch_midpoint, unique_ids)))
+    return {tid: price for tid, price in prices.items() if price is not None}
+
+
 def fetch_price(token_id: str, side: str) -> float:
     """Fetch the best price for a side (buy/sell)."""
     _validate_token_id(token_id)
@@ -91,13 +301,21 @@ def fetch_price(token_id: str, side: str) -> float:
     return float(data["price"])
 
 
-def lookup_market(token_id: str) -> dict | None:
-    """Look up market metadata by CLOB token ID via Gamma API."""
+# token_id -> (fetched_at, market dict)
+_MARKET_CACHE: dict[str, tuple[float, dict]] = {}
+
+
+def lookup_market(token_id: str, ttl: float = MARKET_CACHE_TTL) -> dict | None:
+    """Look up market metadata by CLOB token ID via Gamma API (cached for ttl seconds)."""
     _validate_token_id(token_id)
+    cached = _MARKET_CACHE.get(token_id)
+    if cached and time.time() - cached[0] < ttl:
+        return cached[1]
     data = _api_get(
         f"{GAMMA_API}/markets?clob_token_ids={token_id}&limit=1"
     )
     if data and len(data) > 0:
+        _MARKET_CACHE[token_id] = (time.time(), data[0])
         return data[0]
     return None
 
@@ -106,17 +324,89 @@ def lookup_market(token_id: str) -> dict | None:
 # Database
 # ---------------------------------------------------------------------------
 
+# One long-lived connection per thread per database path. PRAGMAs and the
+# schema check run once at open; sqlite3's per-connection statement cache
+# then keeps hot queries prepared across calls.
+_db_local = threading.local()
+
+
 def _get_db() -> sqlite3.Connection:
-    """Open (and possibly initialize) the SQLite database."""
+    """Return the shared SQLite connection, opening (and possibly initializing) it."""
+    conns = getattr(_db_local, "conns", None)
+    if conns is None:
+        conns = _db_local.conns = {}
+    key = str(DB_PATH)
+    conn = conns.get(key)
+    if conn is not None:
+        return conn
+
     DB_DIR.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(DB_PATH))
+    conn = sqlite3.connect(key)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")    # safe with WAL, fewer fsyncs
+    conn.execute("PRAGMA busy_timeout=5000")     # wait out concurrent writers
+    conn.execute("PRAGMA cache_size=-8000")      # 8 MB page cache
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=134217728")   # 128 MB
     conn.execute("PRAGMA foreign_keys=ON")
     _init_schema(conn)
+    conns[key] = conn
+    return conn
+
+
+def _get_db_ro() -> sqlite3.Connection:
+    """Return a shared read-only connection for report-style reads.
+
+    The database is created and migrated through _get_db() first. The
+    connection is opened with mode=ro, so it can never take the write lock.
+    """
+    conns = getattr(_db_local, "conns", None)
+    key = str(DB_PATH) + "?mode=ro"
+    conn = conns.get(key) if conns else None
+    if conn is not None:
+        return conn
+
+    _get_db()
+    conn = sqlite3.connect(f"{DB_PATH.as_uri()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA cache_size=-8000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=134217728")
+    _db_local.conns[key] = conn
     return conn
 
 
+# SQLite allows one writer at a time. Threads in this process queue on this
+# lock before BEGIN IMMEDIATE instead of polling the database's busy handler;
+# other processes are still arbitrated by busy_timeout.
+_write_lock = threading.Lock()
+
+
+def _begin_write(conn: sqlite3.Connection):
+    """Start a write transaction, serialized with this process's other writers.
+
+    The lock is held until the connection is handed back with _release_db.
+    """
+    _write_lock.acquire()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+    except BaseException:
+        _write_lock.release()
+        raise
+    _db_local.holds_write_lock = True
+
+
+def _release_db(conn: sqlite3.Connection):
+    """Hand a shared connection back, discarding any unfinished transaction."""
+    if conn.in_transaction:
+        conn.rollback()
+    if getattr(_db_local, "holds_write_lock", False):
+        _db_local.holds_write_lock = False
+        _write_lock.release()
+
+
 def _init_schema(conn: sqlite3.Connection):
     conn.executescript("""
         CREATE TABLE IF NOT EXISTS portfolios (
@@ -128,7 +418,8 @@ def _init_schema(conn: sqlite3.Connection):
             created_at    TEXT NOT NULL,
             updated_at    TEXT NOT NULL,
             risk_config   TEXT NOT NULL,
-            active        INTEGER NOT NULL DEFAULT 1
+            active        INTEGER NOT NULL DEFAULT 1,
+            positions_value REAL NOT NULL DEFAULT 0
         );
 
         CREATE TABLE IF NOT EXISTS positions (
@@ -160,7 +451,22 @@ def _init_schema(conn: sqlite3.Connection):
             total_cost    REAL NOT NULL,
             reasoning     TEXT,
             executed_at   TEXT NOT NULL,
-            entry_avg     REAL
+            entry_avg     REAL,
+            realized_pnl  REAL
+        );
+
+        -- Covers per-portfolio history (ORDER BY executed_at) and the
+        -- daily-loss range scan on executed_at/action.
+        CREATE INDEX IF NOT EXISTS idx_trades_pf_ts
+            ON trades(portfolio_id, executed_at, action);
+
+        CREATE INDEX IF NOT EXISTS idx_positions_pf_open
+            ON positions(portfolio_id, closed, token_id, side);
+
+        CREATE TABLE IF NOT EXISTS price_cache (
+            token_id      TEXT PRIMARY KEY,
+            price         REAL NOT NULL,
+            fetched_at    INTEGER NOT NULL
         );
 
         CREATE TABLE IF NOT EXISTS daily_snapshots (
@@ -171,9 +477,34 @@ def _init_schema(conn: sqlite3.Connection):
             positions_value REAL NOT NULL,
             total_value   REAL NOT NULL,
             daily_pnl     REAL NOT NULL DEFAULT 0,
+            -- Also serves ordered per-portfolio reads (WHERE portfolio_id
+            -- ORDER BY date) without a separate index.
             UNIQUE(portfolio_id, date)
         );
     """)
+
+    # Migrate databases created before portfolios.positions_value existed
+    # and seed it from the stored prices of open positions.
+    portfolio_cols = {row[1] for row in conn.execute("PRAGMA table_info(portfolios)")}
+    if "positions_value" not in portfolio_cols:
+        conn.execute(
+            "ALTER TABLE portfolios ADD COLUMN positions_value REAL NOT NULL DEFAULT 0"
+        )
+        conn.execute(
+            """UPDATE portfolios SET positions_value = (
+                   SELECT COALESCE(SUM(shares * current_price), 0) FROM positions
+                   WHERE portfolio_id = portfolios.id AND closed = 0)"""
+        )
+
+    # Migrate databases created before trades.realized_pnl existed and
+    # backfill it for historical SELLs from their entry_avg snapshot.
+    trade_cols = {row[1] for row in conn.execute("PRAGMA table_info(trades)")}
+    if "realized_pnl" not in trade_cols:
+        conn.execute("ALTER TABLE trades ADD COLUMN realized_pnl REAL")
+        conn.execute(
+            """UPDATE trades SET realized_pnl = (price - entry_avg) * shares - fee
+               WHERE action = 'SELL' AND entry_avg IS NOT NULL"""
+        )
     conn.commit()
 
 
@@ -211,7 +542,7 @@ def init_portfolio(
         conn.commit()
         pid = cur.lastrowid
     finally:
-        conn.close()
+        _release_db(conn)
 
     return {
         "portfolio_id": pid,
@@ -239,80 +570,174 @@ def _active_portfolio(conn: sqlite3.Connection, name: str = "default") -> dict:
     return dict(row)
 
 
-def get_portfolio(name: str = "default", refresh_prices: bool = True) -> dict:
-    """Return the current portfolio state with live-priced positions."""
+# portfolio id -> (risk_config JSON text, parsed dict). The stored text is
+# compared on lookup, so a changed or recreated portfolio is re-parsed.
+_RISK_CACHE: dict[int, tuple[str, dict]] = {}
+
+
+def _risk_config(pf: dict) -> dict:
+    """Return the portfolio's parsed risk_config, parsing it once per process."""
+    raw = pf["risk_config"]
+    cached = _RISK_CACHE.get(pf["id"])
+    if cached is not None and cached[0] == raw:
+        return cached[1]
+    parsed = _json_loads(raw)
+    _RISK_CACHE[pf["id"]] = (raw, parsed)
+    return parsed
+
+
+# portfolio id -> time.time() of the last live price refresh in this process
+_LAST_REFRESH: dict[int, float] = {}
+
+
+def get_portfolio(
+    name: str = "default",
+    refresh_prices: bool = True,
+    max_price_age: float | None = None,
+    include_positions: bool = True,
+) -> dict:
+    """
+    Return the current portfolio state with live-priced positions.
+
+    If max_price_age is given, the live refresh is skipped when this process
+    already refreshed the portfolio's prices within that many seconds, or
+    when every open position's stored price is at least that fresh.
+    With refresh_prices=False and include_positions=False, totals come
+    straight from the maintained portfolios.positions_value and the
+    "positions" list is omitted.
+    """
     conn = _get_db()
     try:
         pf = _active_portfolio(conn, name)
         pid = pf["id"]
 
+        if refresh_prices and max_price_age is not None:
+            last = _LAST_REFRESH.get(pid)
+            if last is not None and time.time() - last < max_price_age:
+                refresh_prices = False
+
+        if not refresh_prices and not include_positions:
+            num_open = conn.execute(
+                "SELECT COUNT(*) FROM positions WHERE portfolio_id = ? AND closed = 0",
+                (pid,),
+            ).fetchone()[0]
+            state = _portfolio_state(pf, pf["positions_value"], num_open)
+            del state["positions"]
+            return state
+
+        # Only the needed columns, read positionally in the loop below
         positions = conn.execute(
-            "SELECT * FROM positions WHERE portfolio_id = ? AND closed = 0",
+            """SELECT id, token_id, market_question, side, shares, avg_entry,
+                      current_price, opened_at, updated_at
+               FROM positions WHERE portfolio_id = ? AND closed = 0""",
             (pid,),
         ).fetchall()
 
-        pos_list = []
-        positions_value = 0.0
-        for p in positions:
-            p = dict(p)
-            if refresh_prices:
-                try:
-                    p["current_price"] = fetch_midpoint(p["token_id"])
-                    conn.execute(
-                        "UPDATE positions SET current_price = ?, updated_at = ? WHERE id = ?",
-                        (p["current_price"],
-                         datetime.now(timezone.utc).isoformat(), p["id"]),
-                    )
-                except Exception:
-                    pass  # keep stale price
-            value = p["shares"] * p["current_price"]
-            unrealized_pnl = (p["current_price"] - p["avg_entry"]) * p["shares"]
-            pos_list.append({
-                "token_id": p["token_id"],
-                "market_question": p["market_question"],
-                "side": p["side"],
-                "shares": p["shares"],
-                "avg_entry": p["avg_entry"],
-                "current_price": p["current_price"],
+        if refresh_prices and max_price_age is not None and positions:
+            # Stored prices written by another process may be fresh enough;
+            # ISO-8601 UTC timestamps compare correctly as strings.
+            cutoff = (
+                datetime.now(timezone.utc) - timedelta(seconds=max_price_age)
+            ).isoformat()
+            if min(p[8] for p in positions) >= cutoff:
+                refresh_prices = False
+
+        live_prices = {}
+        if refresh_prices:
+            live_prices = fetch_midpoints([p[1] for p in positions])
+            _LAST_REFRESH[pid] = time.time()
+
+        # Columnar pass: resolve each position's price, value and P&L into
+        # flat lists, then materialize the output dicts in one go.
+        now = datetime.now(timezone.utc).isoformat()
+        price_updates = []
+        prices = []
+        values = []
+        pnls = []
+        for pos_id, tid, _, _, shares, avg_entry, price, _, _ in positions:
+            live = live_prices.get(tid)
+            if live is not None:
+                price = live
+                price_updates.append((price, now, pos_id))
+            # else: keep stale price
+            prices.append(price)
+            values.append(shares * price)
+            pnls.append((price - avg_entry) * shares)
+
+        positions_value = sum(values)
+        pos_list = [
+            {
+                "token_id": p[1],
+                "market_question": p[2],
+                "side": p[3],
+                "shares": p[4],
+                "avg_entry": p[5],
+                "current_price": price,
                 "value": round(value, 4),
-                "unrealized_pnl": round(unrealized_pnl, 4),
-                "opened_at": p["opened_at"],
-            })
-            positions_value += value
+                "unrealized_pnl": round(upnl, 4),
+                "opened_at": p[7],
+            }
+            for p, price, value, upnl in zip(positions, prices, values, pnls)
+        ]
 
         total_value = pf["cash_balance"] + positions_value
-        starting = pf["starting_balance"]
-        pnl = total_value - starting
-
-        # Update peak
-        if total_value > pf["peak_value"]:
-            conn.execute(
-                "UPDATE portfolios SET peak_value = ?, updated_at = ? WHERE id = ?",
-                (total_value, datetime.now(timezone.utc).isoformat(), pid),
-            )
 
-        conn.commit()
+        # Persist refreshed prices, the recomputed positions value and any
+        # new peak in one transaction
+        new_peak = total_value > pf["peak_value"]
+        value_changed = abs(positions_value - pf["positions_value"]) > 1e-9
+        if price_updates or value_changed or new_peak:
+            _begin_write(conn)
+            if price_updates:
+                conn.executemany(
+                    "UPDATE positions SET current_price = ?, updated_at = ? WHERE id = ?",
+                    price_updates,
+                )
+            if value_changed:
+                conn.execute(
+                    "UPDATE portfolios SET positions_value = ? WHERE id = ?",
+                    (positions_value, pid),
+                )
+            if new_peak:
+                conn.execute(
+                    "UPDATE portfolios SET peak_value = ?, updated_at = ? WHERE id = ?",
+                    (total_value, now, pid),
+                )
+            conn.commit()
 
-        return {
-            "portfolio_id": pid,
-            "name": pf["name"],
-            "starting_balance": starting,
-            "cash_balance": round(pf["cash_balance"], 4),
-            "positions_value": round(positions_value, 4),
-            "total_value": round(total_value, 4),
-            "pnl": round(pnl, 4),
-            "pnl_pct": round(pnl / starting * 100, 2) if starting else 0,
-            "peak_value": round(max(pf["peak_value"], total_value), 4),
-            "drawdown_pct": round(
-                (max(pf["peak_value"], total_value) - total_value)
-                / max(pf["peak_value"], total_value) * 100, 2
-            ) if max(pf["peak_value"], total_value) > 0 else 0,
-            "positions": pos_list,
-            "num_open_positions": len(pos_list),
-            "created_at": pf["created_at"],
-        }
+        return _portfolio_state(pf, positions_value, len(pos_list), pos_list)
     finally:
-        conn.close()
+        _release_db(conn)
+
+
+def _portfolio_state(
+    pf: dict,
+    positions_value: float,
+    num_open: int,
+    positions: list | None = None,
+) -> dict:
+    """Build the get_portfolio result from a portfolio row and its positions value."""
+    total_value = pf["cash_balance"] + positions_value
+    starting = pf["starting_balance"]
+    pnl = total_value - starting
+    peak = max(pf["peak_value"], total_value)
+    return {
+        "portfolio_id": pf["id"],
+        "name": pf["name"],
+        "starting_balance": starting,
+        "cash_balance": round(pf["cash_balance"], 4),
+        "positions_value": round(positions_value, 4),
+        "total_value": round(total_value, 4),
+        "pnl": round(pnl, 4),
+        "pnl_pct": round(pnl / starting * 100, 2) if starting else 0,
+        "peak_value": round(peak, 4),
+        "drawdown_pct": round(
+            (peak - total_value) / peak * 100, 2
+        ) if peak > 0 else 0,
+        "positions": positions or [],
+        "num_open_positions": num_open,
+        "created_at": pf["created_at"],
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -324,6 +749,7 @@ def _simulate_fill(
     side: str,
     size_usd: float,
     fee_rate: float = DEFAULT_FEE_RATE,
+    assume_sorted: bool = True,
 ) -> dict:
     """
     Walk the order book to simulate a realistic fill.
@@ -331,41 +757,50 @@ def _simulate_fill(
     For a BUY: we consume asks (ascending price).
     For a SELL: we consume bids (descending price).
 
+    The CLOB returns each side already sorted, so by default the levels are
+    walked in place (reversed if the book lists the best price last) instead
+    of being re-sorted. Pass assume_sorted=False for books of unknown order.
+
     Returns: {avg_price, shares_filled, total_cost, fee}
     """
-    if side == "BUY":
-        levels = orderbook.get("asks", [])
-        # asks are already sorted ascending by CLOB
-        levels = sorted(levels, key=lambda x: float(x["price"]))
-    else:
-        levels = orderbook.get("bids", [])
-        levels = sorted(levels, key=lambda x: float(x["price"]), reverse=True)
+    buying = side == "BUY"
+    levels = orderbook.get("asks" if buying else "bids", [])
 
-    if not levels:
+    num_levels = len(levels)
+    if not num_levels:
         raise RuntimeError(
-            f"No {'asks' if side == 'BUY' else 'bids'} in order book — "
+            f"No {'asks' if buying else 'bids'} in order book — "
             "market may be illiquid or closed"
         )
 
+    if not assume_sorted:
+        levels = sorted(levels, key=lambda x: float(x["price"]), reverse=not buying)
+    elif num_levels > 1:
+        first, last = float(levels[0]["price"]), float(levels[-1]["price"])
+        if (first > last) if buying else (first < last):
+            levels = reversed(levels)
+
     remaining_usd = size_usd
     total_shares = 0.0
     total_spent = 0.0
 
     for level in levels:
         price = float(level["price"])
-        available_shares = float(level["size"])
-
         if price <= 0:
             continue
+        available_shares = float(level["size"])
+        level_cost = available_shares * price
 
-        # How many shares can we buy/sell at this level with remaining USD?
-        max_shares_at_level = remaining_usd / price
-        fill_shares = min(available_shares, max_shares_at_level)
-        fill_cost = fill_shares * price
+        # Partial fill: the remaining USD runs out inside this level
+        if level_cost >= remaining_usd:
+            total_shares += remaining_usd / price
+            total_spent += remaining_usd
+            break
 
-        total_shares += fill_shares
-        total_spent += fill_cost
-        remaining_usd -= fill_cost
+        # Otherwise take the whole level and move on
+        total_shares += available_shares
+        total_spent += level_cost
+        remaining_usd -= level_cost
 
         if remaining_usd < 0.001:  # close enough to zero
             break
@@ -381,7 +816,7 @@ def _simulate_fill(
         "shares_filled": round(total_shares, 4),
         "total_cost": round(total_spent + fee, 4),
         "fee": round(fee, 4),
-        "levels_consumed": min(len(levels), 10),  # info only
+        "levels_consumed": min(num_levels, 10),  # info only
     }
 
 
@@ -463,21 +898,25 @@ def _check_daily_loss(
     pid: int,
     starting_balance: float,
     risk_config: dict,
+    now_dt: datetime | None = None,
 ) -> tuple[bool, str]:
     """Check if daily loss limit has been exceeded."""
-    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-
-    # Sum today's realized losses from SELL trades using the entry_avg
-    # snapshot recorded at trade time (not the current positions table).
+    if now_dt is None:
+        now_dt = datetime.now(timezone.utc)
+    today = now_dt.strftime("%Y-%m-%d")
+    tomorrow = (now_dt + timedelta(days=1)).strftime("%Y-%m-%d")
+
+    # Sum today's realized P&L from the value recorded on each SELL at
+    # close time (not the current positions table). The limit is on trading
+    # P&L before fees, as in health_check.query_realized_pnl, so the fee
+    # netted into realized_pnl is added back. executed_at is ISO8601, so a
+    # string range on it can use idx_trades_pf_ts.
     row = conn.execute(
-        """SELECT COALESCE(SUM(
-            CASE WHEN action='SELL' AND entry_avg IS NOT NULL
-                 THEN (price - entry_avg) * shares
-                 ELSE 0 END
-        ), 0) as daily_realized
+        """SELECT COALESCE(SUM(realized_pnl + fee), 0) as daily_realized
         FROM trades
-        WHERE portfolio_id = ? AND date(executed_at) = ?""",
-        (pid, today),
+        WHERE portfolio_id = ? AND executed_at >= ? AND executed_at < ?
+          AND action = 'SELL'""",
+        (pid, today, tomorrow),
     ).fetchone()
 
     daily_loss = abs(min(0, row["daily_realized"])) if row else 0
@@ -527,9 +966,25 @@ def place_order(
     if size <= 0:
         raise ValueError("Size must be positive")
 
+    _validate_token_id(token_id)
+    from concurrent.futures import ThreadPoolExecutor
+
     # Fetch market data and simulate fill BEFORE acquiring the write lock
-    # so we don't hold the lock during network I/O.
-    market_info = lookup_market(token_id)
+    # so we don't hold the lock during network I/O. Market metadata and
+    # the order book are fetched on worker threads while this thread
+    # loads the portfolio state used for risk checks (re-pricing it only
+    # if it was not refreshed within RISK_PRICE_MAX_AGE seconds).
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        market_future = pool.submit(lookup_market, token_id)
+        book_future = (
+            pool.submit(fetch_orderbook, token_id) if price is None else None
+        )
+        portfolio_state = get_portfolio(
+            portfolio_name, max_price_age=RISK_PRICE_MAX_AGE
+        )
+        market_info = market_future.result()
+        orderbook = book_future.result() if book_future else None
+
     market_question = market_info["question"] if market_info else "Unknown market"
 
     if price is not None:
@@ -544,20 +999,16 @@ def place_order(
         }
     else:
         # Market order: walk the real order book
-        orderbook = fetch_orderbook(token_id)
         fill = _simulate_fill(orderbook, "BUY", size, fee_rate)
 
-    # Get portfolio state for risk checks (also does network I/O)
-    portfolio_state = get_portfolio(portfolio_name, refresh_prices=True)
-
     conn = _get_db()
     try:
         # Acquire exclusive write lock for atomic balance check + debit
-        conn.execute("BEGIN IMMEDIATE")
+        _begin_write(conn)
 
         pf = _active_portfolio(conn, portfolio_name)
         pid = pf["id"]
-        risk_config = json.loads(pf["risk_config"])
+        risk_config = _risk_config(pf)
 
         # Balance check (always enforced) — re-read inside transaction
         if size > pf["cash_balance"]:
@@ -567,6 +1018,10 @@ def place_order(
                 f"have ${pf['cash_balance']:.2f}"
             )
 
+        # One timestamp for the whole order: risk window and row stamps
+        now_dt = datetime.now(timezone.utc)
+        now = now_dt.isoformat()
+
         # Risk validation
         if not force:
             ok, reason = _validate_risk(
@@ -577,14 +1032,12 @@ def place_order(
                 raise RuntimeError(f"Risk check failed: {reason}")
 
             ok, reason = _check_daily_loss(
-                conn, pid, pf["starting_balance"], risk_config
+                conn, pid, pf["starting_balance"], risk_config, now_dt
             )
             if not ok:
                 conn.rollback()
                 raise RuntimeError(f"Risk check failed: {reason}")
 
-        now = datetime.now(timezone.utc).isoformat()
-
         # Update or create position
         existing = conn.execute(
             """SELECT * FROM positions
@@ -610,6 +1063,11 @@ def place_order(
                 (round(new_shares, 4), round(new_avg, 6),
                  fill["avg_price"], now, existing["id"]),
             )
+            # The whole position is re-marked at the fill price
+            value_delta = (
+                round(new_shares, 4) * fill["avg_price"]
+                - old_shares * existing["current_price"]
+            )
         else:
             conn.execute(
                 """INSERT INTO positions
@@ -620,22 +1078,20 @@ def place_order(
                  fill["shares_filled"], fill["avg_price"],
                  fill["avg_price"], now, now),
             )
+            value_delta = fill["shares_filled"] * fill["avg_price"]
 
-        # Deduct from balance
+        # Deduct from balance and carry the position value change
         new_balance = pf["cash_balance"] - fill["total_cost"]
         conn.execute(
-            "UPDATE portfolios SET cash_balance = ?, updated_at = ? WHERE id = ?",
-            (round(new_balance, 4), now, pid),
+            """UPDATE portfolios
+               SET cash_balance = ?, positions_value = positions_value + ?,
+                   updated_at = ?
+               WHERE id = ?""",
+            (round(new_balance, 4), value_delta, now, pid),
         )
 
-        # Compute avg entry at trade time for accurate daily loss tracking
-        if existing:
-            existing = dict(existing) if not isinstance(existing, dict) else existing
-            trade_entry_avg = existing["avg_entry"]
-        else:
-            trade_entry_avg = fill["avg_price"]
-
-        # Record trade (includes entry_avg snapshot for daily loss calculation)
+        # Record trade last (includes entry_avg snapshot for daily loss
+        # calculation); it is append-only, so nothing above depends on it
         conn.execute(
             """INSERT INTO trades
                (portfolio_id, token_id, market_question, side, action,
@@ -667,7 +1123,7 @@ def place_order(
         conn.rollback()
         raise
     finally:
-        conn.close()
+        _release_db(conn)
 
 
 def close_position(
@@ -704,7 +1160,7 @@ def close_position(
     conn = _get_db()
     try:
         # Acquire exclusive write lock for atomic credit
-        conn.execute("BEGIN IMMEDIATE")
+        _begin_write(conn)
 
         pf = _active_portfolio(conn, portfolio_name)
         pid = pf["id"]
@@ -730,7 +1186,11 @@ def close_position(
                 + (f" side={side}" if side else "")
             )
 
+        now = datetime.now(timezone.utc).isoformat()
         results = []
+        closed_rows = []
+        closed_value = 0.0
+        trade_rows = []
         for pos in positions:
             pos = dict(pos)
 
@@ -756,33 +1216,18 @@ def close_position(
 
             pnl = (avg_sell_price - pos["avg_entry"]) * shares_sold - fee
 
-            now = datetime.now(timezone.utc).isoformat()
-
-            # Mark position closed
-            conn.execute(
-                "UPDATE positions SET closed = 1, closed_at = ?, updated_at = ? WHERE id = ?",
-                (now, now, pos["id"]),
-            )
-
-            # Credit proceeds to balance
             new_balance = pf["cash_balance"] + net_proceeds
-            conn.execute(
-                "UPDATE portfolios SET cash_balance = ?, updated_at = ? WHERE id = ?",
-                (round(new_balance, 4), now, pid),
-            )
             pf["cash_balance"] = new_balance
 
-            # Record trade with entry_avg snapshot for daily loss tracking
-            conn.execute(
-                """INSERT INTO trades
-                   (portfolio_id, token_id, market_question, side, action,
-                    shares, price, fee, total_cost, reasoning, executed_at,
-                    entry_avg)
-                   VALUES (?, ?, ?, ?, 'SELL', ?, ?, ?, ?, ?, ?, ?)""",
+            closed_rows.append((now, now, pos["id"]))
+            closed_value += pos["shares"] * pos["current_price"]
+            # Trade rows carry the entry_avg snapshot and realized P&L
+            # for daily loss tracking
+            trade_rows.append(
                 (pid, token_id, pos["market_question"], pos["side"],
                  round(shares_sold, 4), round(avg_sell_price, 6),
                  round(fee, 4), round(net_proceeds, 4), reasoning, now,
-                 pos["avg_entry"]),
+                 pos["avg_entry"], round(pnl, 4))
             )
 
             results.append({
@@ -801,13 +1246,36 @@ def close_position(
                 "executed_at": now,
             })
 
+        # Write every closed leg in one batch: mark positions closed,
+        # credit the net proceeds and drop their value once, and record
+        # the SELL trades.
+        conn.executemany(
+            "UPDATE positions SET closed = 1, closed_at = ?, updated_at = ? WHERE id = ?",
+            closed_rows,
+        )
+        conn.execute(
+            """UPDATE portfolios
+               SET cash_balance = ?, positions_value = positions_value - ?,
+                   updated_at = ?
+               WHERE id = ?""",
+            (round(pf["cash_balance"], 4), closed_value, now, pid),
+        )
+        conn.executemany(
+            """INSERT INTO trades
+               (portfolio_id, token_id, market_question, side, action,
+                shares, price, fee, total_cost, reasoning, executed_at,
+                entry_avg, realized_pnl)
+               VALUES (?, ?, ?, ?, 'SELL', ?, ?, ?, ?, ?, ?, ?, ?)""",
+            trade_rows,
+        )
+
         conn.commit()
         return results[0] if len(results) == 1 else results
     except Exception:
         conn.rollback()
         raise
     finally:
-        conn.close()
+        _release_db(conn)
 
 
 def get_trades(
@@ -827,7 +1295,7 @@ def get_trades(
         ).fetchall()
         return [dict(r) for r in rows]
     finally:
-        conn.close()
+        _release_db(conn)
 
 
 # ---------------------------------------------------------------------------
@@ -836,49 +1304,75 @@ def get_trades(
 
 def take_snapshot(portfolio_name: str = "default") -> dict:
     """Record a daily portfolio snapshot for performance tracking."""
-    state = get_portfolio(portfolio_name, refresh_prices=True)
+    return take_snapshots([portfolio_name])[0]
+
+
+def take_snapshots(portfolio_names: list[str]) -> list[dict]:
+    """Record today's snapshot for several portfolios in one write transaction."""
+    # Price refreshes write through get_portfolio's own transaction, so
+    # gather every state before opening the snapshot batch.
+    states = [get_portfolio(name, refresh_prices=True) for name in portfolio_names]
     today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
 
     conn = _get_db()
     try:
-        pid = state["portfolio_id"]
-
-        # Get yesterday's snapshot for daily P&L
-        prev = conn.execute(
-            """SELECT total_value FROM daily_snapshots
-               WHERE portfolio_id = ? AND date < ?
-               ORDER BY date DESC LIMIT 1""",
-            (pid, today),
-        ).fetchone()
-
-        prev_value = prev["total_value"] if prev else state["starting_balance"]
-        daily_pnl = state["total_value"] - prev_value
+        rows = []
+        results = []
+        for state in states:
+            pid = state["portfolio_id"]
+
+            # Get yesterday's snapshot for daily P&L
+            prev = conn.execute(
+                """SELECT total_value FROM daily_snapshots
+                   WHERE portfolio_id = ? AND date < ?
+                   ORDER BY date DESC LIMIT 1""",
+                (pid, today),
+            ).fetchone()
+
+            prev_value = prev["total_value"] if prev else state["starting_balance"]
+            daily_pnl = state["total_value"] - prev_value
+
+            rows.append(
+                (pid, today, state["cash_balance"], state["positions_value"],
+                 state["total_value"], round(daily_pnl, 4))
+            )
+            results.append({
+                "date": today,
+                "total_value": state["total_value"],
+                "daily_pnl": round(daily_pnl, 4),
+                "cash": state["cash_balance"],
+                "positions_value": state["positions_value"],
+            })
 
-        conn.execute(
+        _begin_write(conn)
+        conn.executemany(
             """INSERT OR REPLACE INTO daily_snapshots
                (portfolio_id, date, cash_balance, positions_value,
                 total_value, daily_pnl)
                VALUES (?, ?, ?, ?, ?, ?)""",
-            (pid, today, state["cash_balance"], state["positions_value"],
-             state["total_value"], round(daily_pnl, 4)),
+            rows,
         )
         conn.commit()
-
-        return {
-            "date": today,
-            "total_value": state["total_value"],
-            "daily_pnl": round(daily_pnl, 4),
-            "cash": state["cash_balance"],
-            "positions_value": state["positions_value"],
-        }
+        return results
     finally:
-        conn.close()
+        _release_db(conn)
 
 
 # ---------------------------------------------------------------------------
 # Formatting helpers
 # ---------------------------------------------------------------------------
 
+# Row fields read by the formatters, fetched in one C-level call per row
+_position_cols = itemgetter(
+    "side", "shares", "avg_entry", "current_price", "unrealized_pnl",
+    "market_question",
+)
+_trade_cols = itemgetter(
+    "executed_at", "action", "side", "shares", "price", "total_cost", "fee",
+    "market_question", "reasoning",
+)
+
+
 def _format_portfolio(pf: dict) -> str:
     """Format portfolio state for human-readable output."""
     lines = [
@@ -896,14 +1390,14 @@ def _format_portfolio(pf: dict) -> str:
     if pf["positions"]:
         lines.append("\n--- Open Positions ---")
         for p in pf["positions"]:
-            pnl_str = f"${p['unrealized_pnl']:+,.2f}"
+            side, shares, entry, price, upnl, question = _position_cols(p)
             lines.append(
-                f"  {p['side']:>3} {p['shares']:>8.2f} shares @ "
-                f"${p['avg_entry']:.4f} -> ${p['current_price']:.4f}  "
-                f"P&L: {pnl_str}"
+                f"  {side:>3} {shares:>8.2f} shares @ "
+                f"${entry:.4f} -> ${price:.4f}  "
+                f"P&L: ${upnl:+,.2f}"
             )
-            if p["market_question"]:
-                lines.append(f"      {p['market_question'][:70]}")
+            if question:
+                lines.append(f"      {question[:70]}")
     return "\n".join(lines)
 
 
@@ -913,24 +1407,138 @@ def _format_trades(trades: list[dict]) -> str:
         return "No trades recorded."
     lines = ["=== Trade History ==="]
     for t in trades:
+        (ts, action, side, shares, price, cost, fee,
+         question, reasoning) = _trade_cols(t)
         lines.append(
-            f"  [{t['executed_at'][:19]}] {t['action']:>4} {t['side']:>3} "
-            f"{t['shares']:>8.2f} @ ${t['price']:.4f} "
-            f"(cost: ${t['total_cost']:.2f}, fee: ${t['fee']:.2f})"
+            f"  [{ts[:19]}] {action:>4} {side:>3} "
+            f"{shares:>8.2f} @ ${price:.4f} "
+            f"(cost: ${cost:.2f}, fee: ${fee:.2f})"
         )
-        if t.get("market_question"):
-            lines.append(f"    {t['market_question'][:70]}")
-        if t.get("reasoning"):
-            lines.append(f"    Reason: {t['reasoning'][:70]}")
+        if question:
+            lines.append(f"    {question[:70]}")
+        if reasoning:
+            lines.append(f"    Reason: {reasoning[:70]}")
     return "\n".join(lines)
 
 
 # ---------------------------------------------------------------------------
-# CLI
+# Persistent worker mode
 # ---------------------------------------------------------------------------
 
+def _serve_request(req: dict):
+    """Run one serve-mode request; keys mirror the CLI flags."""
+    action = req.get("action")
+    name = req.get("name", "default")
+    if action == "init":
+        return init_portfolio(req.get("balance", DEFAULT_BALANCE), name)
+    if action in ("buy", "sell"):
+        return place_order(
+            token_id=req["token"],
+            side=req["side"],
+            size=req["size"],
+            price=req.get("price"),
+            reasoning=req.get("reason", ""),
+            portfolio_name=name,
+            fee_rate=req.get("fee_rate", DEFAULT_FEE_RATE),
+            force=req.get("force", False),
+        )
+    if action == "close":
+        side = req.get("side")
+        return close_position(
+            token_id=req["token"],
+            side=side.upper() if side else None,
+            portfolio_name=name,
+            fee_rate=req.get("fee_rate", DEFAULT_FEE_RATE),
+            reasoning=req.get("reason", ""),
+        )
+    if action == "portfolio":
+        return get_portfolio(name, refresh_prices=req.get("refresh", True))
+    if action == "trades":
+        return get_trades(name, req.get("limit", 50))
+    if action == "snapshot":
+        names = name if isinstance(name, list) else [name]
+        results = take_snapshots(names)
+        return results[0] if len(results) == 1 else results
+    raise ValueError(f"Unknown action: {action!r}")
+
+
+def serve(stdin=None, stdout=None):
+    """
+    Answer newline-delimited JSON requests until EOF.
+
+    Each input line is an object such as {"action": "buy", "token": "...",
+    "side": "YES", "size": 50}; each reply is one JSON line, either
+    {"ok": true, "result": ...} or {"ok": false, "error": "..."}. The
+    process keeps its SQLite connection, prepared statements, HTTP pool and
+    caches warm across requests.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            req = json.loads(line)
+            if not isinstance(req, dict):
+                raise ValueError("Request must be a JSON object")
+            reply = {"ok": True, "result": _serve_request(req)}
+        except KeyError as exc:
+            reply = {"ok": False, "error": f"Missing field: {exc.args[0]}"}
+        except (RuntimeError, ValueError, TypeError) as exc:
+            reply = {"ok": False, "error": str(exc)}
+        except Exception as exc:
+            # One bad request (e.g. a mistyped field reaching SQLite) must
+            # not end the session; report it like any other failure.
+            reply = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+        if not reply["ok"]:
+            # Never let a half-finished write carry into the next request
+            try:
+                _release_db(_get_db())
+            except sqlite3.Error:
+                pass
+        stdout.write(json.dumps(reply, default=str) + "\n")
+        stdout.flush()
+
+
+# _CliParser leans on argparse internals: add_argument calling the private
+# _get_formatter() once per argument only to run _format_args(action, None)
+# on it. Checked against CPython 3.11 and 3.13; on other versions the
+# override steps aside and argparse behaves as stock.
+_CLI_PARSER_REUSE_FORMATTER = (3, 11) <= sys.version_info[:2] <= (3, 13)
+
+
+class _CliParser(argparse.ArgumentParser):
+    """
+    ArgumentParser that reuses one formatter for add_argument's checks.
+
+    add_argument builds a throwaway HelpFormatter for every argument just to
+    validate its metavar, and each one probes the terminal size. Help output
+    still gets a fresh formatter.
+    """
+
+    _check_formatter = None
+    _adding_argument = False
+
+    def add_argument(self, *args, **kwargs):
+        if not _CLI_PARSER_REUSE_FORMATTER:
+            return super().add_argument(*args, **kwargs)
+        if self._check_formatter is None:
+            self._check_formatter = super()._get_formatter()
+        self._adding_argument = True
+        try:
+            return super().add_argument(*args, **kwargs)
+        finally:
+            self._adding_argument = False
+
+    def _get_formatter(self):
+        if self._adding_argument:
+            return self._check_formatter
+        return super()._get_formatter()
+
+
 def main():
-    parser = argparse.ArgumentParser(
+    parser = _CliParser(
         description="Polymarket Paper Trading Engine",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
@@ -942,16 +1550,18 @@ Examples:
   %(prog)s --action portfolio
   %(prog)s --action trades
   %(prog)s --action snapshot
+  %(prog)s --action snapshot --name main,aggressive
+  %(prog)s --action serve < requests.jsonl
         """,
     )
     parser.add_argument("--action", required=True,
                         choices=["init", "buy", "sell", "close",
-                                 "portfolio", "trades", "snapshot"],
+                                 "portfolio", "trades", "snapshot", "serve"],
                         help="Action to perform")
     parser.add_argument("--balance", type=float, default=DEFAULT_BALANCE,
                         help="Starting balance (init only)")
     parser.add_argument("--name", default="default",
-                        help="Portfolio name")
+                        help="Portfolio name (snapshot accepts a comma-separated list)")
     parser.add_argument("--token", help="CLOB token ID")
     parser.add_argument("--side", choices=["YES", "NO", "yes", "no"],
                         help="Trade side")
@@ -970,11 +1580,15 @@ Examples:
 
     args = parser.parse_args()
 
+    if args.action == "serve":
+        serve()
+        return
+
     try:
         if args.action == "init":
             result = init_portfolio(args.balance, args.name)
             if args.json:
-                print(json.dumps(result, indent=2))
+                print(_json_dumps(result))
             else:
                 print(f"Portfolio '{result['name']}' initialized with "
                       f"${result['starting_balance']:,.2f}")
@@ -998,7 +1612,7 @@ Examples:
                 force=args.force,
             )
             if args.json:
-                print(json.dumps(result, indent=2))
+                print(_json_dumps(result))
             else:
                 print(
                     f"{result['action']} {result['side']} "
@@ -1021,50 +1635,44 @@ Examples:
                 reasoning=args.reason,
             )
             if args.json:
-                print(json.dumps(result, indent=2))
+                print(_json_dumps(result))
             else:
-                if isinstance(result, list):
-                    for r in result:
-                        print(
-                            f"Closed {r['side']} position: "
-                            f"{r['shares_sold']:.2f} shares @ "
-                            f"${r['avg_sell_price']:.4f}\n"
-                            f"Realized P&L: ${r['realized_pnl']:+,.2f}\n"
-                            f"New balance: ${r['new_balance']:.2f}"
-                        )
-                else:
+                for r in result if isinstance(result, list) else [result]:
                     print(
-                        f"Closed {result['side']} position: "
-                        f"{result['shares_sold']:.2f} shares @ "
-                        f"${result['avg_sell_price']:.4f}\n"
-                        f"Realized P&L: ${result['realized_pnl']:+,.2f}\n"
-                        f"New balance: ${result['new_balance']:.2f}"
+                        f"Closed {r['side']} position: "
+                        f"{r['shares_sold']:.2f} shares @ "
+                        f"${r['avg_sell_price']:.4f}\n"
+                        f"Realized P&L: ${r['realized_pnl']:+,.2f}\n"
+                        f"New balance: ${r['new_balance']:.2f}"
                     )
 
         elif args.action == "portfolio":
             result = get_portfolio(args.name, refresh_prices=True)
             if args.json:
-                print(json.dumps(result, indent=2))
+                print(_json_dumps(result))
             else:
                 print(_format_portfolio(result))
 
         elif args.action == "trades":
             result = get_trades(args.name, args.limit)
             if args.json:
-                print(json.dumps(result, indent=2, default=str))
+                print(_json_dumps(result))
             else:
                 print(_format_trades(result))
 
         elif args.action == "snapshot":
-            result = take_snapshot(args.name)
+            names = [n.strip() for n in args.name.split(",") if n.strip()]
+            results = take_snapshots(names)
             if args.json:
-                print(json.dumps(result, indent=2))
+                print(_json_dumps(results[0] if len(results) == 1 else results))
             else:
-                print(
-                    f"Snapshot for {result['date']}: "
-                    f"${result['total_value']:,.2f} "
-                    f"(daily P&L: ${result['daily_pnl']:+,.2f})"
-                )
+                for name, result in zip(names, results):
+                    prefix = f"[{name}] " if len(names) > 1 else ""
+                    print(
+                        f"{prefix}Snapshot for {result['date']}: "
+                        f"${result['total_value']:,.2f} "
+                        f"(daily P&L: ${result['daily_pnl']:+,.2f})"
+                    )
 
     except (RuntimeError, ValueError) as exc:
         print(f"ERROR: {exc}", file=sys.stderr)
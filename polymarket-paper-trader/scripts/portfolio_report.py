@@ -10,13 +10,16 @@ Generates detailed analytics for a paper trading portfolio:
 - Output as formatted text or JSON
 """
 
-import argparse
-import json
+import heapq
 import math
 import sqlite3
 import sys
+from collections import deque
 from datetime import datetime, timezone
+from itertools import accumulate, pairwise
+from operator import itemgetter
 from pathlib import Path
+from typing import Iterator
 
 import os
 _THIS_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -24,49 +27,124 @@ if _THIS_DIR not in sys.path:
     sys.path.append(_THIS_DIR)
 from paper_engine import (
     DB_PATH,
-    _get_db,
+    _CliParser,
+    _get_db_ro,
+    _json_dumps,
+    _release_db,
     _active_portfolio,
     get_portfolio,
 )
 
+if sys.version_info >= (3, 11):
+    # fromisoformat accepts a trailing "Z" natively from 3.11 on
+    _parse_ts = datetime.fromisoformat
+else:
+    def _parse_ts(ts: str) -> datetime:
+        """Parse an ISO-8601 timestamp, accepting a trailing "Z"."""
+        if ts.endswith("Z"):
+            ts = ts[:-1] + "+00:00"
+        return datetime.fromisoformat(ts)
+
+
+def generate_report(
+    portfolio_name: str = "default",
+    refresh_prices: bool = True,
+    max_price_age: float | None = None,
+) -> dict:
+    """
+    Generate a full performance report for the portfolio.
 
-def generate_report(portfolio_name: str = "default") -> dict:
-    """Generate a full performance report for the portfolio."""
-    conn = _get_db()
+    refresh_prices=False values open positions at their stored prices;
+    max_price_age skips the live refresh when stored prices are that fresh
+    (see get_portfolio).
+    """
+    conn = _get_db_ro()
     try:
         pf = _active_portfolio(conn, portfolio_name)
         pid = pf["id"]
         starting = pf["starting_balance"]
 
-        # Get current state with live prices
-        current = get_portfolio(portfolio_name, refresh_prices=True)
+        # Get current state, with live prices unless told otherwise
+        current = get_portfolio(
+            portfolio_name,
+            refresh_prices=refresh_prices,
+            max_price_age=max_price_age,
+        )
+
+        # ----- Daily snapshots -----
+        # All reads share one deferred transaction (a single snapshot and
+        # shared-lock acquisition). Only the equity series is used; keep it
+        # as a flat column of values.
+        conn.execute("BEGIN")
+        snapshot_values = [
+            row[0] for row in conn.execute(
+                """SELECT total_value FROM daily_snapshots WHERE portfolio_id = ?
+                   ORDER BY date ASC""",
+                (pid,),
+            )
+        ]
+        num_trades, total_fees = conn.execute(
+            """SELECT COUNT(*), COALESCE(SUM(fee), 0) FROM trades
+               WHERE portfolio_id = ?""",
+            (pid,),
+        ).fetchone()
 
         # ----- Trade analysis -----
+        # Stream trades from the cursor through the matcher and fold each
+        # closed round trip into running totals; neither the trade rows nor
+        # the closed trades are materialized.
         trades = conn.execute(
-            """SELECT * FROM trades WHERE portfolio_id = ?
+            """SELECT token_id, market_question, side, action, shares, price,
+                      fee, reasoning, executed_at
+               FROM trades WHERE portfolio_id = ?
                ORDER BY executed_at ASC""",
             (pid,),
-        ).fetchall()
-        trades = [dict(t) for t in trades]
-
-        # Match buys to sells to compute per-trade P&L
-        closed_trades = _match_trades(trades)
+        )
+        num_closed = num_winning = 0
+        gross_profit = gross_loss_sum = 0.0
+        duration_hours = 0.0
+        num_durations = 0
+        # Bounded heaps of the three best and worst trades. The index breaks
+        # pnl ties: earliest first for best, latest first for worst.
+        best_heap: list[tuple] = []
+        worst_heap: list[tuple] = []
+        for i, ct in enumerate(_match_trades(trades)):
+            num_closed += 1
+            pnl = ct["pnl"]
+            if pnl > 0:
+                num_winning += 1
+                gross_profit += pnl
+            else:
+                gross_loss_sum += pnl
+
+            best = (pnl, -i, ct)
+            if len(best_heap) < 3:
+                heapq.heappush(best_heap, best)
+            else:
+                heapq.heappushpop(best_heap, best)
+            worst = (-pnl, i, ct)
+            if len(worst_heap) < 3:
+                heapq.heappush(worst_heap, worst)
+            else:
+                heapq.heappushpop(worst_heap, worst)
+
+            if ct["open_time"] and ct["close_time"]:
+                try:
+                    t_open = _parse_ts(ct["open_time"])
+                    t_close = _parse_ts(ct["close_time"])
+                except (ValueError, TypeError):
+                    continue
+                duration_hours += (t_close - t_open).total_seconds() / 3600
+                num_durations += 1
+        conn.commit()
         open_positions = current["positions"]
 
-        # ----- Daily snapshots -----
-        snapshots = conn.execute(
-            """SELECT * FROM daily_snapshots WHERE portfolio_id = ?
-               ORDER BY date ASC""",
-            (pid,),
-        ).fetchall()
-        snapshots = [dict(s) for s in snapshots]
-
         # ----- Core metrics -----
         total_value = current["total_value"]
         total_return = (total_value - starting) / starting if starting else 0
 
         # Time-based calculations
-        created = datetime.fromisoformat(pf["created_at"].replace("Z", "+00:00"))
+        created = _parse_ts(pf["created_at"])
         now = datetime.now(timezone.utc)
         days_active = max((now - created).days, 1)
         years_active = days_active / 365.25
@@ -76,60 +154,33 @@ def generate_report(portfolio_name: str = "default") -> dict:
             if years_active > 0 and total_return > -1 else 0
         )
 
-        # Win rate
-        winning = [t for t in closed_trades if t["pnl"] > 0]
-        losing = [t for t in closed_trades if t["pnl"] <= 0]
-        win_rate = len(winning) / len(closed_trades) if closed_trades else 0
-
-        # Average P&L
-        avg_win = (
-            sum(t["pnl"] for t in winning) / len(winning) if winning else 0
-        )
-        avg_loss = (
-            sum(t["pnl"] for t in losing) / len(losing) if losing else 0
-        )
+        # Win rate and average P&L
+        num_losing = num_closed - num_winning
+        win_rate = num_winning / num_closed if num_closed else 0
+        avg_win = gross_profit / num_winning if num_winning else 0
+        avg_loss = gross_loss_sum / num_losing if num_losing else 0
 
         # Profit factor
-        gross_profit = sum(t["pnl"] for t in winning)
-        gross_loss = abs(sum(t["pnl"] for t in losing))
+        gross_loss = abs(gross_loss_sum)
         profit_factor = gross_profit / gross_loss if gross_loss > 0 else float("inf")
 
         # ----- Drawdown from snapshots -----
-        equity_curve = [starting]
-        if snapshots:
-            equity_curve = [s["total_value"] for s in snapshots]
+        equity_curve = snapshot_values or [starting]
         max_drawdown, max_dd_duration = _compute_drawdown(equity_curve)
 
         # ----- Sharpe & Sortino from daily returns -----
-        daily_returns = _daily_returns(snapshots, starting)
+        daily_returns = _daily_returns(snapshot_values, starting)
         sharpe = _sharpe_ratio(daily_returns)
         sortino = _sortino_ratio(daily_returns)
 
         # ----- Average trade duration -----
-        durations = []
-        for ct in closed_trades:
-            if ct.get("open_time") and ct.get("close_time"):
-                try:
-                    t_open = datetime.fromisoformat(
-                        ct["open_time"].replace("Z", "+00:00")
-                    )
-                    t_close = datetime.fromisoformat(
-                        ct["close_time"].replace("Z", "+00:00")
-                    )
-                    durations.append((t_close - t_open).total_seconds() / 3600)
-                except (ValueError, TypeError):
-                    pass
         avg_duration_hours = (
-            sum(durations) / len(durations) if durations else 0
+            duration_hours / num_durations if num_durations else 0
         )
 
         # ----- Best / Worst trades -----
-        sorted_by_pnl = sorted(closed_trades, key=lambda t: t["pnl"], reverse=True)
-        best_trades = sorted_by_pnl[:3] if sorted_by_pnl else []
-        worst_trades = sorted_by_pnl[-3:][::-1] if sorted_by_pnl else []
-
-        # ----- Fees -----
-        total_fees = sum(t.get("fee", 0) for t in trades)
+        best_trades = [entry[2] for entry in sorted(best_heap, reverse=True)]
+        worst_trades = [entry[2] for entry in sorted(worst_heap, reverse=True)]
 
         report = {
             "portfolio_name": portfolio_name,
@@ -152,8 +203,8 @@ def generate_report(portfolio_name: str = "default") -> dict:
                 "current_drawdown_pct": current["drawdown_pct"],
             },
             "trade_metrics": {
-                "total_trades": len(trades),
-                "closed_trades": len(closed_trades),
+                "total_trades": num_trades,
+                "closed_trades": num_closed,
                 "open_positions": len(open_positions),
                 "win_rate_pct": round(win_rate * 100, 1),
                 "avg_win_usd": round(avg_win, 2),
@@ -184,76 +235,88 @@ def generate_report(portfolio_name: str = "default") -> dict:
         return report
 
     finally:
-        conn.close()
+        _release_db(conn)
 
 
 # ---------------------------------------------------------------------------
 # Analytics helpers
 # ---------------------------------------------------------------------------
 
-def _match_trades(trades: list[dict]) -> list[dict]:
+# Trade fields read by the matcher, fetched in one C-level call per row
+_match_cols = itemgetter(
+    "token_id", "side", "action", "shares", "price", "fee", "executed_at",
+    "market_question", "reasoning",
+)
+
+
+def _match_trades(trades) -> Iterator[dict]:
     """
     Match BUY and SELL trades on the same token/side to compute
-    per-round-trip P&L.
+    per-round-trip P&L, yielding each closed round trip as it is matched.
+
+    trades may be any iterable of dicts or sqlite3.Row objects in execution
+    order, including a live cursor. Values are left unrounded;
+    _trade_summary rounds the few that are reported.
     """
-    # Group buys by (token_id, side)
-    open_lots: dict[tuple, list] = {}
-    closed: list[dict] = []
+    # Open BUY lots per (token_id, side), consumed FIFO
+    open_lots: dict[tuple, deque] = {}
 
     for t in trades:
-        key = (t["token_id"], t["side"])
-
-        if t["action"] == "BUY":
-            if key not in open_lots:
-                open_lots[key] = []
-            open_lots[key].append({
-                "shares": t["shares"],
-                "price": t["price"],
-                "fee": t["fee"],
-                "time": t["executed_at"],
-                "market": t.get("market_question", ""),
-                "reasoning": t.get("reasoning", ""),
+        (token_id, side, action, shares, price, fee, executed_at,
+         market, reasoning) = _match_cols(t)
+        key = (token_id, side)
+
+        if action == "BUY":
+            lots = open_lots.get(key)
+            if lots is None:
+                lots = open_lots[key] = deque()
+            lots.append({
+                "shares": shares,
+                "price": price,
+                "fee": fee,
+                "time": executed_at,
+                "market": market,
+                "reasoning": reasoning,
             })
 
-        elif t["action"] == "SELL":
-            lots = open_lots.get(key, [])
-            remaining = t["shares"]
-            sell_price = t["price"]
-            sell_fee = t["fee"]
-            sell_time = t["executed_at"]
+        elif action == "SELL":
+            lots = open_lots.get(key)
+            if not lots:
+                continue
+            remaining = shares
+            sell_fee_per_share = fee / shares if shares > 0 else 0
 
             while remaining > 0.0001 and lots:
                 lot = lots[0]
-                matched = min(remaining, lot["shares"])
+                lot_price = lot["price"]
+                lot_shares = lot["shares"]
+                matched = min(remaining, lot_shares)
 
-                pnl = (sell_price - lot["price"]) * matched - (
-                    lot["fee"] * (matched / lot["shares"]) if lot["shares"] > 0 else 0
-                ) - (
-                    sell_fee * (matched / t["shares"]) if t["shares"] > 0 else 0
-                )
+                pnl = (price - lot_price) * matched - (
+                    lot["fee"] * (matched / lot_shares) if lot_shares > 0 else 0
+                ) - sell_fee_per_share * matched
 
-                closed.append({
-                    "token_id": t["token_id"],
-                    "side": t["side"],
+                yield {
+                    "token_id": token_id,
+                    "side": side,
                     "market": lot["market"],
-                    "shares": round(matched, 4),
-                    "entry_price": lot["price"],
-                    "exit_price": sell_price,
-                    "pnl": round(pnl, 4),
-                    "pnl_pct": round(
-                        (sell_price - lot["price"]) / lot["price"] * 100, 2
-                    ) if lot["price"] > 0 else 0,
+                    "shares": matched,
+                    "entry_price": lot_price,
+                    "exit_price": price,
+                    "pnl": pnl,
+                    "pnl_pct": (
+                        (price - lot_price) / lot_price * 100
+                        if lot_price > 0 else 0
+                    ),
                     "open_time": lot["time"],
-                    "close_time": sell_time,
+                    "close_time": executed_at,
                     "reasoning": lot["reasoning"],
-                })
+                }
 
-                lot["shares"] -= matched
+                lot["shares"] = lot_shares - matched
                 remaining -= matched
                 if lot["shares"] < 0.0001:
-                    lots.pop(0)
-
-    return closed
+                    lots.popleft()
 
 
 def _compute_drawdown(equity_curve: list[float]) -> tuple[float, int]:
@@ -261,46 +324,61 @@ def _compute_drawdown(equity_curve: list[float]) -> tuple[float, int]:
     if not equity_curve or len(equity_curve) < 2:
         return 0.0, 0
 
-    peak = equity_curve[0]
-    max_dd = 0.0
-    dd_start = 0
-    max_dd_duration = 0
-    current_dd_start = 0
-
-    for i, value in enumerate(equity_curve):
-        if value >= peak:
-            peak = value
-            duration = i - current_dd_start
-            max_dd_duration = max(max_dd_duration, duration)
-            current_dd_start = i
-        else:
-            dd = (peak - value) / peak
-            if dd > max_dd:
-                max_dd = dd
-                dd_start = current_dd_start
+    # Running peak in one C-level pass; a day is a new (or equal) high
+    # exactly when its value matches the running peak.
+    peaks = list(accumulate(equity_curve, max))
+    max_dd = max(
+        (peak - value) / peak if value < peak else 0.0
+        for peak, value in zip(peaks, equity_curve)
+    )
 
-    # Check if still in drawdown
-    if equity_curve[-1] < peak:
-        duration = len(equity_curve) - 1 - current_dd_start
-        max_dd_duration = max(max_dd_duration, duration)
+    # Duration: longest stretch between consecutive highs, including an
+    # unrecovered drawdown at the end of the curve.
+    high_days = [i for i, (peak, value) in enumerate(zip(peaks, equity_curve))
+                 if value == peak]
+    max_dd_duration = max(b - a for a, b in pairwise([0] + high_days))
+    if equity_curve[-1] < peaks[-1]:
+        max_dd_duration = max(max_dd_duration, len(equity_curve) - 1 - high_days[-1])
 
     return max_dd, max_dd_duration
 
 
 def _daily_returns(
-    snapshots: list[dict],
+    snapshot_values: list[float],
     starting_balance: float,
 ) -> list[float]:
-    """Extract daily return series from snapshots."""
-    if not snapshots:
+    """Extract daily return series from snapshot total values."""
+    if not snapshot_values:
         return []
 
-    values = [starting_balance] + [s["total_value"] for s in snapshots]
-    returns = []
-    for i in range(1, len(values)):
-        if values[i - 1] > 0:
-            returns.append((values[i] - values[i - 1]) / values[i - 1])
-    return returns
+    values = [starting_balance, *snapshot_values]
+    return [
+        (curr - prev) / prev
+        for prev, curr in pairwise(values)
+        if prev > 0
+    ]
+
+
+def _excess_moments(
+    daily_returns: list[float],
+    risk_free_daily: float,
+) -> tuple[float, float, float]:
+    """
+    One pass over excess daily returns: (mean, sum of squared deviations,
+    sum of squared negative excess). Mean and deviations use Welford's
+    update, so no intermediate excess list is built.
+    """
+    mean = 0.0
+    m2 = 0.0
+    down_sq = 0.0
+    for n, r in enumerate(daily_returns, 1):
+        x = r - risk_free_daily
+        delta = x - mean
+        mean += delta / n
+        m2 += delta * (x - mean)
+        if x < 0:
+            down_sq += x * x
+    return mean, m2, down_sq
 
 
 def _sharpe_ratio(
@@ -308,17 +386,15 @@ def _sharpe_ratio(
     risk_free_daily: float = 0.0001,  # ~3.7% annual
 ) -> float:
     """Annualized Sharpe ratio from daily returns."""
-    if len(daily_returns) < 2:
+    n = len(daily_returns)
+    if n < 2:
         return 0.0
 
-    excess = [r - risk_free_daily for r in daily_returns]
-    mean_excess = sum(excess) / len(excess)
-    variance = sum((r - mean_excess) ** 2 for r in excess) / (len(excess) - 1)
-    std = math.sqrt(variance) if variance > 0 else 0
-
-    if std == 0:
+    mean_excess, m2, _ = _excess_moments(daily_returns, risk_free_daily)
+    variance = m2 / (n - 1)
+    if variance <= 0:
         return 0.0
-    return (mean_excess / std) * math.sqrt(252)
+    return (mean_excess / math.sqrt(variance)) * math.sqrt(252)
 
 
 def _sortino_ratio(
@@ -326,18 +402,14 @@ def _sortino_ratio(
     risk_free_daily: float = 0.0001,
 ) -> float:
     """Annualized Sortino ratio (uses downside deviation only)."""
-    if len(daily_returns) < 2:
+    n = len(daily_returns)
+    if n < 2:
         return 0.0
 
-    excess = [r - risk_free_daily for r in daily_returns]
-    mean_excess = sum(excess) / len(excess)
-
-    downside = [min(0, r) ** 2 for r in excess]
-    downside_dev = math.sqrt(sum(downside) / len(downside)) if downside else 0
-
-    if downside_dev == 0:
+    mean_excess, _, down_sq = _excess_moments(daily_returns, risk_free_daily)
+    if down_sq == 0:
         return 0.0
-    return (mean_excess / downside_dev) * math.sqrt(252)
+    return (mean_excess / math.sqrt(down_sq / n)) * math.sqrt(252)
 
 
 def _trade_summary(trade: dict) -> dict:
@@ -345,11 +417,11 @@ def _trade_summary(trade: dict) -> dict:
     return {
         "market": trade.get("market", "")[:70],
         "side": trade["side"],
-        "shares": trade["shares"],
+        "shares": round(trade["shares"], 4),
         "entry": trade["entry_price"],
         "exit": trade["exit_price"],
-        "pnl_usd": trade["pnl"],
-        "pnl_pct": trade["pnl_pct"],
+        "pnl_usd": round(trade["pnl"], 4),
+        "pnl_pct": round(trade["pnl_pct"], 2),
         "duration": trade.get("close_time", ""),
     }
 
@@ -397,61 +469,72 @@ def format_report(report: dict) -> str:
         f"  Avg Trade Duration:   {t['avg_trade_duration_hours']:>12.1f} hours",
     ]
 
-    if report["best_trades"]:
-        lines += ["", "--- Best Trades ---"]
-        for i, bt in enumerate(report["best_trades"], 1):
-            lines.append(
-                f"  {i}. {bt['side']} {bt['shares']:.1f}sh "
-                f"${bt['entry']:.4f}->${bt['exit']:.4f} "
-                f"P&L: ${bt['pnl_usd']:+,.2f} ({bt['pnl_pct']:+.1f}%)"
-            )
-            if bt.get("market"):
-                lines.append(f"     {bt['market']}")
-
-    if report["worst_trades"]:
-        lines += ["", "--- Worst Trades ---"]
-        for i, wt in enumerate(report["worst_trades"], 1):
-            lines.append(
-                f"  {i}. {wt['side']} {wt['shares']:.1f}sh "
-                f"${wt['entry']:.4f}->${wt['exit']:.4f} "
-                f"P&L: ${wt['pnl_usd']:+,.2f} ({wt['pnl_pct']:+.1f}%)"
-            )
-            if wt.get("market"):
-                lines.append(f"     {wt['market']}")
+    for title, trades in (
+        ("Best Trades", report["best_trades"]),
+        ("Worst Trades", report["worst_trades"]),
+    ):
+        if trades:
+            lines += ["", f"--- {title} ---"]
+            lines.extend(_format_trade_rows(trades))
 
     if report["open_positions"]:
         lines += ["", "--- Open Positions ---"]
         for p in report["open_positions"]:
+            market = p.get("market")
             lines.append(
                 f"  {p['side']} {p['shares']:.1f}sh "
                 f"@ ${p['entry']:.4f} -> ${p['current']:.4f} "
                 f"P&L: ${p['unrealized_pnl']:+,.2f}"
             )
-            if p.get("market"):
-                lines.append(f"     {p['market']}")
+            if market:
+                lines.append(f"     {market}")
 
     lines.append("")
     lines.append("=" * 60)
     return "\n".join(lines)
 
 
+def _format_trade_rows(trades: list[dict]) -> list[str]:
+    """Numbered text rows for a best/worst trade list."""
+    rows = []
+    for i, tr in enumerate(trades, 1):
+        market = tr.get("market")
+        rows.append(
+            f"  {i}. {tr['side']} {tr['shares']:.1f}sh "
+            f"${tr['entry']:.4f}->${tr['exit']:.4f} "
+            f"P&L: ${tr['pnl_usd']:+,.2f} ({tr['pnl_pct']:+.1f}%)"
+        )
+        if market:
+            rows.append(f"     {market}")
+    return rows
+
+
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
 
 def main():
-    parser = argparse.ArgumentParser(
+    parser = _CliParser(
         description="Generate portfolio performance report",
     )
     parser.add_argument("--portfolio", default="default", help="Portfolio name")
     parser.add_argument("--json", action="store_true", help="JSON output")
+    parser.add_argument("--no-refresh", action="store_true",
+                        help="Use stored prices instead of fetching live ones")
+    parser.add_argument("--price-ttl", type=float, default=None,
+                        help="Skip the live refresh if stored prices are this "
+                             "many seconds fresh")
 
     args = parser.parse_args()
 
     try:
-        report = generate_report(args.portfolio)
+        report = generate_report(
+            args.portfolio,
+            refresh_prices=not args.no_refresh,
+            max_price_age=args.price_ttl,
+        )
         if args.json:
-            print(json.dumps(report, indent=2))
+            print(_json_dumps(report))
         else:
             print(format_report(report))
     except RuntimeError as exc:
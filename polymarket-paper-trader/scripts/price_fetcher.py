@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Coalesced CLOB Midpoint Fetching
+
+Shares a single in-flight HTTP request between concurrent callers asking
+for the same token, so parallel price refreshes never hit the
+rate-limited CLOB endpoint twice for one token at the same time.
+Outbound requests are also spaced per domain to stay inside provider
+rate limits when many tokens are fetched in parallel.
+
+Coalescing only applies within one process: separate CLI runs each have
+their own in-flight table. health_check's fetch_live_prices already
+dedupes token IDs, so today the limiter does the work there and the
+coalescing is a safeguard for callers that fetch without deduping.
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+_THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+if _THIS_DIR not in sys.path:
+    sys.path.append(_THIS_DIR)
+from paper_engine import CLOB_API, fetch_midpoint
+
+# Minimum spacing between requests to one domain (default 20 ms ~ 50 req/s)
+CLOB_MIN_INTERVAL_MS = float(os.environ.get("POLYMARKET_CLOB_MIN_INTERVAL_MS", "20"))
+
+
+class DomainRateLimiter:
+    """Thread-safe per-domain limiter enforcing a minimum request interval."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_slot: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, domain: str):
+        """Block until the caller's reserved slot for this domain arrives."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(domain, 0.0))
+            self._next_slot[domain] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+_limiter = DomainRateLimiter(CLOB_MIN_INTERVAL_MS / 1000.0)
+_CLOB_DOMAIN = urlparse(CLOB_API).netloc
+
+# token_id -> Future for the request currently in flight
+_inflight: dict[str, Future] = {}
+_lock = threading.Lock()
+
+
+def get_midpoint(token_id: str) -> float:
+    """
+    Fetch the midpoint for a token, joining any identical in-flight request.
+
+    Raises whatever fetch_midpoint raises; waiters on a shared request see
+    the same exception.
+    """
+    with _lock:
+        future = _inflight.get(token_id)
+        owner = future is None
+        if owner:
+            future = Future()
+            _inflight[token_id] = future
+
+    if owner:
+        try:
+            _limiter.wait(_CLOB_DOMAIN)
+            future.set_result(fetch_midpoint(token_id))
+        except Exception as exc:
+            future.set_exception(exc)
+        finally:
+            with _lock:
+                _inflight.pop(token_id, None)
+
+    return future.result()
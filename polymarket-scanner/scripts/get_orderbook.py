@@ -2,58 +2,113 @@
 """Fetch the full order book for a Polymarket token from the CLOB API."""
 
 import argparse
+import heapq
 import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 
 from py_clob_client.client import ClobClient
 
 CLOB_HOST = "https://clob.polymarket.com"
 
+# Sort key for (price, size) level tuples
+_price = itemgetter(0)
 
-def fetch_orderbook(token_id, depth=10):
+
+def _as_levels(levels):
+    """Convert (price, size) tuples to the returned level dicts."""
+    return [{"price": p, "size": s} for p, s in levels]
+
+
+def _book_side(levels, depth, descending):
+    """Parse one side of the book in a single pass.
+
+    Returns ``(top, total_size, num_levels)`` where ``top`` holds the best
+    ``depth`` levels in price priority. Only those levels are ordered: a
+    full sort when the side is small, otherwise a bounded heap selection.
+    """
+    parsed = []
+    total = 0.0
+    for lvl in levels:
+        size = float(lvl.size)
+        parsed.append((float(lvl.price), size))
+        total += size
+
+    if depth >= len(parsed):
+        top = sorted(parsed, key=_price, reverse=descending)
+    elif descending:
+        top = heapq.nlargest(depth, parsed, key=_price)
+    else:
+        top = heapq.nsmallest(depth, parsed, key=_price)
+    return top, total, len(parsed)
+
+
+def fetch_orderbook(token_id, depth=10, client=None):
     """Fetch order book for a token and return structured data."""
-    client = ClobClient(CLOB_HOST)
+    if client is None:
+        client = ClobClient(CLOB_HOST)
     ob = client.get_order_book(token_id)
 
-    bids = [{"price": float(b.price), "size": float(b.size)} for b in ob.bids]
-    asks = [{"price": float(a.price), "size": float(a.size)} for a in ob.asks]
+    bids, bid_total, bid_levels = _book_side(ob.bids, max(depth, 1), True)
+    asks, ask_total, ask_levels = _book_side(ob.asks, max(depth, 1), False)
 
-    # Sort: bids descending by price, asks ascending by price
-    bids.sort(key=lambda x: x["price"], reverse=True)
-    asks.sort(key=lambda x: x["price"])
-
-    best_bid = bids[0]["price"] if bids else 0.0
-    best_ask = asks[0]["price"] if asks else 1.0
+    best_bid = bids[0][0] if bids else 0.0
+    best_ask = asks[0][0] if asks else 1.0
     spread = round(best_ask - best_bid, 6)
     midpoint = round((best_ask + best_bid) / 2, 6)
 
-    bid_depth = round(sum(b["size"] for b in bids), 2)
-    ask_depth = round(sum(a["size"] for a in asks), 2)
+    bid_depth = round(bid_total, 2)
+    ask_depth = round(ask_total, 2)
 
     return {
         "market": ob.market,
         "asset_id": ob.asset_id,
-        "bids": bids[:depth],
-        "asks": asks[:depth],
+        "bids": _as_levels(bids[:depth]),
+        "asks": _as_levels(asks[:depth]),
         "spread": spread,
         "midpoint": midpoint,
         "best_bid": best_bid,
         "best_ask": best_ask,
         "bid_depth": bid_depth,
         "ask_depth": ask_depth,
-        "total_bid_levels": len(bids),
-        "total_ask_levels": len(asks),
+        "total_bid_levels": bid_levels,
+        "total_ask_levels": ask_levels,
     }
 
 
+def fetch_orderbooks(token_ids, depth=10, max_workers=16):
+    """Fetch order books for several tokens concurrently, keyed by token ID.
+
+    Each fetch is a single I/O-bound request, so the books are requested in
+    parallel over one shared client instead of one after another.
+    """
+    token_ids = list(dict.fromkeys(token_ids))
+    if not token_ids:
+        return {}
+    client = ClobClient(CLOB_HOST)
+    workers = max(1, min(max_workers, len(token_ids)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        books = pool.map(
+            lambda tid: fetch_orderbook(tid, depth=depth, client=client),
+            token_ids,
+        )
+        return dict(zip(token_ids, books))
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Fetch order book for a Polymarket token"
     )
-    parser.add_argument(
-        "--token-id", type=str, required=True,
+    tokens = parser.add_mutually_exclusive_group(required=True)
+    tokens.add_argument(
+        "--token-id", type=str,
         help="CLOB token ID (from scan_markets.py output)"
     )
+    tokens.add_argument(
+        "--token-ids", type=str,
+        help="Comma-separated CLOB token IDs; prints an array of order books"
+    )
     parser.add_argument(
         "--depth", type=int, default=10,
         help="Number of price levels to show (default 10)"
@@ -62,7 +117,11 @@ def main():
     args = parser.parse_args()
 
     try:
-        result = fetch_orderbook(args.token_id, depth=args.depth)
+        if args.token_ids:
+            token_ids = [t.strip() for t in args.token_ids.split(",") if t.strip()]
+            result = list(fetch_orderbooks(token_ids, depth=args.depth).values())
+        else:
+            result = fetch_orderbook(args.token_id, depth=args.depth)
         print(json.dumps(result, indent=2))
     except Exception as e:
         print(json.dumps({"error": str(e)}), file=sys.stderr)
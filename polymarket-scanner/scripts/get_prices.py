@@ -3,34 +3,53 @@
 
 import argparse
 import json
+import os
 import sys
+from functools import lru_cache
 
 import requests
 from py_clob_client.client import ClobClient
 from py_clob_client.clob_types import BookParams
 
+# Shared session and JSON helpers (same directory)
+_THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+if _THIS_DIR not in sys.path:
+    sys.path.append(_THIS_DIR)
+from market_api import GAMMA_API, _SESSION, _json_dumps, _json_loads
+
 CLOB_HOST = "https://clob.polymarket.com"
-GAMMA_API = "https://gamma-api.polymarket.com"
 
 
 def resolve_slug_to_token_ids(slug):
-    """Look up a market by slug and return its token IDs."""
-    resp = requests.get(
-        f"{GAMMA_API}/markets",
-        params={"slug": slug, "limit": 1},
-        timeout=30,
-    )
-    resp.raise_for_status()
-    markets = resp.json()
+    """Look up a market by slug and return its token IDs.
+
+    Returns an empty list if the lookup fails or the market is unknown.
+    """
+    try:
+        resp = _SESSION.get(
+            f"{GAMMA_API}/markets",
+            params={"slug": slug, "limit": 1},
+            timeout=30,
+        )
+        resp.raise_for_status()
+        markets = _json_loads(resp.content)
+    except (requests.RequestException, ValueError):
+        return []
     if not markets:
         return []
     market = markets[0]
     try:
-        return json.loads(market.get("clobTokenIds", "[]"))
+        return _json_loads(market.get("clobTokenIds", "[]"))
     except (json.JSONDecodeError, TypeError):
         return []
 
 
+@lru_cache(maxsize=1024)
+def _book_param(token_id, side=""):
+    """Shared BookParams for a token/side; the client only reads them."""
+    return BookParams(token_id=token_id, side=side)
+
+
 def fetch_prices(token_ids):
     """Fetch prices for a list of token IDs using the CLOB API."""
     client = ClobClient(CLOB_HOST)
@@ -54,44 +73,66 @@ def fetch_prices(token_ids):
         }]
 
     # Batch mode for multiple tokens
-    params = [BookParams(token_id=tid) for tid in token_ids]
+    params = [_book_param(tid) for tid in token_ids]
     midpoints = client.get_midpoints(params)
     spreads = client.get_spreads(params)
     last_trades_raw = client.get_last_trades_prices(params)
 
     # last_trades_prices returns a list of dicts with token_id key, not a dict
-    last_trades_by_id = {}
-    if isinstance(last_trades_raw, list):
-        for item in last_trades_raw:
-            if isinstance(item, dict) and "token_id" in item:
-                last_trades_by_id[item["token_id"]] = item
-    elif isinstance(last_trades_raw, dict):
-        last_trades_by_id = last_trades_raw
+    last_trades_by_id = (
+        {
+            item["token_id"]: item
+            for item in last_trades_raw
+            if isinstance(item, dict) and "token_id" in item
+        }
+        if isinstance(last_trades_raw, list)
+        else last_trades_raw if isinstance(last_trades_raw, dict)
+        else {}
+    )
+
+    # Bid/ask for every token in one batched request: BUY and SELL params
+    try:
+        side_prices = client.get_prices(
+            [_book_param(tid, "BUY") for tid in token_ids]
+            + [_book_param(tid, "SELL") for tid in token_ids]
+        )
+    except Exception:
+        side_prices = {}
+    if not isinstance(side_prices, dict):
+        side_prices = {}
+
+    # Bound lookups for the per-token loop
+    mid_get = midpoints.get
+    spread_get = spreads.get
+    last_get = last_trades_by_id.get
+    sides_get = side_prices.get
+    _float = float
 
     results = []
+    append = results.append
     for tid in token_ids:
-        mid_val = midpoints.get(tid, "0")
-        spread_val = spreads.get(tid, "0")
-        last_info = last_trades_by_id.get(tid, {})
+        mid_val = mid_get(tid, "0")
+        spread_val = spread_get(tid, "0")
+        last_info = last_get(tid, {})
+        if not isinstance(last_info, dict):
+            last_info = {}
 
-        # Get individual bid/ask prices
+        sides = sides_get(tid) or {}
         try:
-            buy_price = client.get_price(tid, "BUY")
-            sell_price = client.get_price(tid, "SELL")
-            best_bid = float(buy_price.get("price", 0))
-            best_ask = float(sell_price.get("price", 0))
-        except Exception:
+            best_bid = _float(sides.get("BUY", 0))
+            best_ask = _float(sides.get("SELL", 0))
+        except (TypeError, ValueError):
             best_bid = 0.0
             best_ask = 0.0
 
-        results.append({
+        append({
             "token_id": tid,
-            "midpoint": float(mid_val) if mid_val else 0.0,
+            "midpoint": _float(mid_val) if mid_val else 0.0,
             "best_bid": best_bid,
             "best_ask": best_ask,
-            "spread": float(spread_val) if spread_val else 0.0,
-            "last_trade_price": float(last_info.get("price", 0)) if isinstance(last_info, dict) else 0.0,
-            "last_trade_side": last_info.get("side", "") if isinstance(last_info, dict) else "",
+            "spread": _float(spread_val) if spread_val else 0.0,
+            "last_trade_price": _float(last_info.get("price", 0)),
+            "last_trade_side": last_info.get("side", ""),
         })
 
     return results
@@ -129,7 +170,7 @@ def main():
 
     try:
         results = fetch_prices(token_ids)
-        print(json.dumps(results, indent=2))
+        print(_json_dumps(results))
     except Exception as e:
         print(json.dumps({"error": str(e)}), file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Shared HTTP session and JSON helpers for the scanner scripts."""
+
+import json
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Optional faster JSON codec: orjson for API payloads (str or bytes) and
+# the indented CLI output, stdlib json otherwise.
+try:
+    import orjson
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj):
+        """Indented JSON text for CLI output."""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(obj):
+        """Indented JSON text for CLI output."""
+        return json.dumps(obj, indent=2)
+
+GAMMA_API = "https://gamma-api.polymarket.com"
+
+# One keep-alive session shared by every API call; transient failures on
+# idempotent requests are retried with backoff.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+    ),
+))
+# Compressed transfer is already negotiated by requests' default
+# Accept-Encoding; bodies are decoded from resp.content, never resp.text.
+_SESSION.headers["Accept"] = "application/json"
+
+
+def _decode_market_lists(m):
+    """Decode a market's JSON-encoded outcomes, outcomePrices and clobTokenIds.
+
+    The three strings are decoded in a single call as one synthetic array;
+    if that fails, each field is decoded on its own and a bad field falls
+    back to [] without affecting the others.
+    """
+    fields = (
+        m.get("outcomes", "[]"),
+        m.get("outcomePrices", "[]"),
+        m.get("clobTokenIds", "[]"),
+    )
+    if all(isinstance(f, str) for f in fields):
+        try:
+            decoded = _json_loads(f"[{fields[0]},{fields[1]},{fields[2]}]")
+            if len(decoded) == 3:
+                outcomes, prices, token_ids = decoded
+                return outcomes, [float(p) for p in prices], token_ids
+        except (json.JSONDecodeError, TypeError, ValueError):
+            pass
+
+    try:
+        outcomes = _json_loads(fields[0])
+    except (json.JSONDecodeError, TypeError):
+        outcomes = []
+    try:
+        prices = [float(p) for p in _json_loads(fields[1])]
+    except (json.JSONDecodeError, TypeError, ValueError):
+        prices = []
+    try:
+        token_ids = _json_loads(fields[2])
+    except (json.JSONDecodeError, TypeError):
+        token_ids = []
+    return outcomes, prices, token_ids
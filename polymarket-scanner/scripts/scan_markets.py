@@ -3,21 +3,37 @@
 
 import argparse
 import json
-import re
+import os
 import sys
 
 import requests
 
-GAMMA_API = "https://gamma-api.polymarket.com"
+# Shared session and JSON helpers (same directory)
+_THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+if _THIS_DIR not in sys.path:
+    sys.path.append(_THIS_DIR)
+from market_api import (
+    GAMMA_API,
+    _SESSION,
+    _decode_market_lists,
+    _json_dumps,
+    _json_loads,
+)
 
 MAX_TEXT_LEN = 200
 
+# Control characters stripped from market text (everything below 0x20
+# except tab, newline and carriage return, plus DEL), as a translate table
+_CONTROL_CHARS = dict.fromkeys(
+    [*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20), 0x7F]
+)
+
 
 def sanitize_text(text):
     """Strip control characters and limit length. Market text is user-generated."""
     if not text:
         return ""
-    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', '', text)
+    text = text.translate(_CONTROL_CHARS)
     if len(text) > MAX_TEXT_LEN:
         text = text[:MAX_TEXT_LEN] + "..."
     return text
@@ -37,9 +53,11 @@ def fetch_markets(limit=20, category=None, search=None, min_volume=0,
     if category:
         params["tag_slug"] = category.lower()
 
-    resp = requests.get(f"{GAMMA_API}/markets", params=params, timeout=30)
+    resp = _SESSION.get(f"{GAMMA_API}/markets", params=params, timeout=30)
     resp.raise_for_status()
-    raw_markets = resp.json()
+    raw_markets = _json_loads(resp.content)
+
+    search_lower = search.lower() if search else None
 
     results = []
     for m in raw_markets:
@@ -47,30 +65,15 @@ def fetch_markets(limit=20, category=None, search=None, min_volume=0,
         if vol_24h < min_volume:
             continue
 
+        # Apply keyword search filter before parsing any JSON fields
+        if search_lower and not (
+            search_lower in (m.get("question", "") or "").lower()
+            or search_lower in (m.get("description", "") or "").lower()
+        ):
+            continue
+
         # Parse JSON-encoded fields
-        try:
-            outcomes = json.loads(m.get("outcomes", "[]"))
-        except (json.JSONDecodeError, TypeError):
-            outcomes = []
-
-        try:
-            outcome_prices = json.loads(m.get("outcomePrices", "[]"))
-            outcome_prices = [float(p) for p in outcome_prices]
-        except (json.JSONDecodeError, TypeError, ValueError):
-            outcome_prices = []
-
-        try:
-            token_ids = json.loads(m.get("clobTokenIds", "[]"))
-        except (json.JSONDecodeError, TypeError):
-            token_ids = []
-
-        # Apply keyword search filter
-        if search:
-            question = (m.get("question", "") or "").lower()
-            description = (m.get("description", "") or "").lower()
-            search_lower = search.lower()
-            if search_lower not in question and search_lower not in description:
-                continue
+        outcomes, outcome_prices, token_ids = _decode_market_lists(m)
 
         market = {
             "question": sanitize_text(m.get("question", "")),
@@ -132,8 +135,8 @@ def main():
             sort_by=args.sort_by,
             ascending=args.ascending,
         )
-        print(json.dumps(markets, indent=2))
-    except requests.RequestException as e:
+        print(_json_dumps(markets))
+    except (requests.RequestException, ValueError) as e:
         print(json.dumps({"error": str(e)}), file=sys.stderr)
         sys.exit(1)
 
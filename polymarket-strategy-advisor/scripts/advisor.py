@@ -12,24 +12,95 @@ Usage:
 """
 
 import argparse
+import heapq
 import json
 import math
 import os
 import sqlite3
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from operator import itemgetter
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# HTTP session and JSON helpers. Skills are installed independently, so
+# this is a local copy of polymarket-scanner/scripts/market_api.py.
+try:
+    import orjson
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj):
+        """Indented JSON text for CLI output."""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(obj):
+        """Indented JSON text for CLI output."""
+        return json.dumps(obj, indent=2)
 
 GAMMA_API = "https://gamma-api.polymarket.com"
 CLOB_API = "https://clob.polymarket.com"
 
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+    ),
+))
+_SESSION.headers["Accept"] = "application/json"
+
 DEFAULT_PORTFOLIO_VALUE = 10000.0
 DEFAULT_MAX_POSITION_PCT = 0.10
 DEFAULT_MAX_OPEN_POSITIONS = 5
 DEFAULT_MIN_EDGE = 0.03
 DEFAULT_MIN_VOLUME = 10000.0
 DEFAULT_MIN_CONFIDENCE = 0.5
+# YES prices outside this band are effectively resolved; such markets are
+# dropped at selection time, before any orderbook is requested
+MIN_TRADABLE_PRICE = 0.03
+MAX_TRADABLE_PRICE = 0.97
+ORDERBOOK_WORKERS = 20
+BOOKS_BATCH_SIZE = 50  # tokens per POST /books request
+DEPTH_LEVELS = 5  # book levels per side counted toward depth/imbalance
+
+
+def _decode_market_lists(m):
+    """Decode a market's outcomes, outcomePrices and clobTokenIds (bad fields -> [])."""
+    fields = (
+        m.get("outcomes", "[]"),
+        m.get("outcomePrices", "[]"),
+        m.get("clobTokenIds", "[]"),
+    )
+    if all(isinstance(f, str) for f in fields):
+        try:
+            decoded = _json_loads(f"[{fields[0]},{fields[1]},{fields[2]}]")
+            if len(decoded) == 3:
+                outcomes, prices, token_ids = decoded
+                return outcomes, [float(p) for p in prices], token_ids
+        except (json.JSONDecodeError, TypeError, ValueError):
+            pass
+
+    try:
+        outcomes = _json_loads(fields[0])
+    except (json.JSONDecodeError, TypeError):
+        outcomes = []
+    try:
+        prices = [float(p) for p in _json_loads(fields[1])]
+    except (json.JSONDecodeError, TypeError, ValueError):
+        prices = []
+    try:
+        token_ids = _json_loads(fields[2])
+    except (json.JSONDecodeError, TypeError):
+        token_ids = []
+    return outcomes, prices, token_ids
 
 
 def fetch_markets(limit=100, min_volume=0):
@@ -41,9 +112,13 @@ def fetch_markets(limit=100, min_volume=0):
         "order": "volume24hr",
         "ascending": "false",
     }
-    resp = requests.get(f"{GAMMA_API}/markets", params=params, timeout=30)
+    resp = _SESSION.get(f"{GAMMA_API}/markets", params=params, timeout=30)
     resp.raise_for_status()
-    raw = resp.json()
+    raw = _json_loads(resp.content)
+
+    # Markets resolving within the next 24 hours are skipped; one clock read
+    # covers the whole page.
+    cutoff_ts = datetime.now(timezone.utc).timestamp() + 24 * 3600
 
     markets = []
     for m in raw:
@@ -53,19 +128,7 @@ def fetch_markets(limit=100, min_volume=0):
         if not m.get("acceptingOrders", False):
             continue
 
-        try:
-            outcomes = json.loads(m.get("outcomes", "[]"))
-        except (json.JSONDecodeError, TypeError):
-            outcomes = []
-        try:
-            prices = json.loads(m.get("outcomePrices", "[]"))
-            prices = [float(p) for p in prices]
-        except (json.JSONDecodeError, TypeError, ValueError):
-            prices = []
-        try:
-            token_ids = json.loads(m.get("clobTokenIds", "[]"))
-        except (json.JSONDecodeError, TypeError):
-            token_ids = []
+        outcomes, prices, token_ids = _decode_market_lists(m)
 
         # Only handle binary markets (2 outcomes) for now
         if len(outcomes) != 2 or len(prices) != 2 or len(token_ids) != 2:
@@ -75,8 +138,8 @@ def fetch_markets(limit=100, min_volume=0):
         if end_date:
             try:
                 end_dt = datetime.fromisoformat(end_date.replace("Z", "+00:00"))
-                hours_left = (end_dt - datetime.now(timezone.utc)).total_seconds() / 3600
-                if hours_left < 24:
+                # Naive timestamps can't be placed in UTC; keep those markets
+                if end_dt.tzinfo is not None and end_dt.timestamp() < cutoff_ts:
                     continue
             except (ValueError, TypeError):
                 pass
@@ -99,17 +162,67 @@ def fetch_markets(limit=100, min_volume=0):
 def fetch_orderbook(token_id):
     """Fetch orderbook for a token from CLOB API."""
     try:
-        resp = requests.get(
+        resp = _SESSION.get(
             f"{CLOB_API}/book",
             params={"token_id": token_id},
             timeout=15,
         )
         resp.raise_for_status()
-        return resp.json()
-    except requests.RequestException:
+        return _json_loads(resp.content)
+    except (requests.RequestException, ValueError):
+        # ValueError: non-JSON body (e.g. an HTML error page)
         return None
 
 
+def _fetch_books_batch(token_ids):
+    """POST one batch to the CLOB /books endpoint; returns books by asset ID."""
+    resp = _SESSION.post(
+        f"{CLOB_API}/books",
+        json=[{"token_id": tid} for tid in token_ids],
+        timeout=15,
+    )
+    resp.raise_for_status()
+    return {
+        book.get("asset_id"): book
+        for book in _json_loads(resp.content)
+        if isinstance(book, dict)
+    }
+
+
+def fetch_orderbooks(token_ids, max_workers=ORDERBOOK_WORKERS):
+    """Fetch orderbooks for several tokens, keyed by token ID.
+
+    Books come from the batched /books endpoint, BOOKS_BATCH_SIZE tokens
+    per request with the batches sent concurrently. Tokens the batch call
+    did not return (or all of them, if it failed) fall back to parallel
+    per-token /book requests. Failed fetches map to None.
+    """
+    token_ids = list(dict.fromkeys(token_ids))
+    if not token_ids:
+        return {}
+
+    books = {}
+    batches = [
+        token_ids[i:i + BOOKS_BATCH_SIZE]
+        for i in range(0, len(token_ids), BOOKS_BATCH_SIZE)
+    ]
+    workers = max(1, min(max_workers, len(batches)))
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for batch_books in pool.map(_fetch_books_batch, batches):
+                books.update(batch_books)
+    except (requests.RequestException, ValueError):
+        pass  # batch endpoint unavailable; fetch everything per token
+
+    missing = [tid for tid in token_ids if tid not in books]
+    if missing:
+        workers = max(1, min(max_workers, len(missing)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            books.update(zip(missing, pool.map(fetch_orderbook, missing)))
+
+    return {tid: books.get(tid) for tid in token_ids}
+
+
 def calculate_spread(orderbook):
     """Calculate spread and imbalance from orderbook data."""
     if not orderbook:
@@ -126,8 +239,8 @@ def calculate_spread(orderbook):
     spread = best_ask - best_bid
     midpoint = (best_bid + best_ask) / 2
 
-    bid_depth = sum(float(b.get("size", 0)) for b in bids[:5])
-    ask_depth = sum(float(a.get("size", 0)) for a in asks[:5])
+    bid_depth = math.fsum(map(float, (b.get("size", 0) for b in bids[:DEPTH_LEVELS])))
+    ask_depth = math.fsum(map(float, (a.get("size", 0) for a in asks[:DEPTH_LEVELS])))
     total_depth = bid_depth + ask_depth
     imbalance = (bid_depth - ask_depth) / total_depth if total_depth > 0 else 0
 
@@ -210,25 +323,17 @@ def kelly_half(estimated_prob, market_price, side="YES"):
     Returns:
         Half-Kelly fraction (0 to 1), or 0 if negative EV.
     """
-    if side == "YES":
-        p = estimated_prob
-        cost = market_price
-    else:
-        p = 1.0 - estimated_prob
-        cost = market_price
-
+    cost = market_price
     if cost <= 0 or cost >= 1:
         return 0
 
+    p = estimated_prob if side == "YES" else 1.0 - estimated_prob
+
     # Payout is 1.0 per share, cost is market_price
-    # b = net payout / cost = (1 - cost) / cost
+    # b = net payout / cost = (1 - cost) / cost, which is > 0 for 0 < cost < 1
     b = (1.0 - cost) / cost
-    q = 1.0 - p
-    if b <= 0:
-        return 0
-
-    kelly = (b * p - q) / b
-    return max(0, kelly * 0.5)
+    kelly = (b * p - (1.0 - p)) / b
+    return kelly * 0.5 if kelly > 0 else 0
 
 
 def load_portfolio(db_path):
@@ -262,28 +367,42 @@ def load_portfolio(db_path):
             "open_position_count": 0,
         }
 
-        # Read account balance from portfolios table
+        # Balance and open-position value in one statement
+        portfolio_id = None
         try:
             cur.execute(
-                "SELECT cash_balance, peak_value FROM portfolios "
-                "WHERE active = 1 ORDER BY id DESC LIMIT 1"
+                """SELECT p.id, p.cash_balance, p.peak_value,
+                          (SELECT COALESCE(SUM(shares * current_price), 0)
+                           FROM positions
+                           WHERE portfolio_id = p.id AND closed = 0) AS pos_val
+                   FROM portfolios p
+                   WHERE p.active = 1 ORDER BY p.id DESC LIMIT 1"""
             )
             row = cur.fetchone()
             if row:
+                portfolio_id = row["id"]
                 portfolio["cash"] = float(row["cash_balance"])
                 portfolio["peak_value"] = float(row["peak_value"])
-                # Calculate total value: cash + positions value
-                pos_cur = conn.cursor()
-                pos_cur.execute(
-                    "SELECT COALESCE(SUM(shares * current_price), 0) as pos_val "
-                    "FROM positions WHERE portfolio_id = 1 AND closed = 0"
-                )
-                pos_row = pos_cur.fetchone()
-                pos_val = float(pos_row["pos_val"]) if pos_row else 0.0
-                portfolio["value"] = portfolio["cash"] + pos_val
+                portfolio["value"] = portfolio["cash"] + float(row["pos_val"])
         except sqlite3.OperationalError:
             pass
 
+        # Read today's P&L from daily snapshots
+        if portfolio_id is not None:
+            try:
+                today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+                cur.execute(
+                    "SELECT daily_pnl FROM daily_snapshots "
+                    "WHERE portfolio_id = ? AND date = ? "
+                    "ORDER BY id DESC LIMIT 1",
+                    (portfolio_id, today),
+                )
+                row = cur.fetchone()
+                if row and row["daily_pnl"] is not None:
+                    portfolio["daily_pnl"] = float(row["daily_pnl"])
+            except sqlite3.OperationalError:
+                pass
+
         # Read open positions
         try:
             cur.execute(
@@ -296,20 +415,6 @@ def load_portfolio(db_path):
         except sqlite3.OperationalError:
             pass
 
-        # Read daily P&L from daily_snapshots
-        try:
-            today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-            cur.execute(
-                "SELECT daily_pnl FROM daily_snapshots "
-                "WHERE date = ? ORDER BY id DESC LIMIT 1",
-                (today,),
-            )
-            row = cur.fetchone()
-            if row:
-                portfolio["daily_pnl"] = float(row["daily_pnl"])
-        except sqlite3.OperationalError:
-            pass
-
         conn.close()
         return portfolio
 
@@ -361,25 +466,22 @@ def check_risk_rules(portfolio, position_size_usdc, confidence):
     return True, "OK"
 
 
-def score_market(market, portfolio):
-    """Analyze a single market and return a trade recommendation or None."""
+def score_market(market, portfolio, orderbook, arb):
+    """Analyze a single market and return a trade recommendation or None.
+
+    The market must already be inside the tradable price band (see
+    MIN_TRADABLE_PRICE/MAX_TRADABLE_PRICE). orderbook is the pre-fetched
+    book for the market's YES token (or None if it could not be fetched);
+    arb is the market's detect_arbitrage result from the scan-wide pre-pass.
+    """
     yes_price = market["prices"][0]
     no_price = market["prices"][1]
 
-    # Skip markets priced at extremes (already resolved in practice)
-    if yes_price < 0.03 or yes_price > 0.97:
-        return None
-
-    # Fetch orderbook for the YES token (used for imbalance/depth signals)
-    ob = fetch_orderbook(market["token_ids"][0])
-    spread_info = calculate_spread(ob)
+    # YES-token orderbook drives the imbalance/depth signals
+    spread_info = calculate_spread(orderbook)
 
     # Detect edges, pick the strongest
-    edges = []
-
-    arb = detect_arbitrage(yes_price, no_price)
-    if arb:
-        edges.append(arb)
+    edges = [arb] if arb else []
 
     if spread_info:
         mom = detect_momentum(
@@ -539,7 +641,7 @@ def main():
     # Fetch and filter markets
     try:
         markets = fetch_markets(limit=args.scan_limit, min_volume=args.min_volume)
-    except requests.RequestException as e:
+    except (requests.RequestException, ValueError) as e:
         print(json.dumps({"error": f"Failed to fetch markets: {e}"}), file=sys.stderr)
         sys.exit(1)
 
@@ -551,11 +653,25 @@ def main():
         }, indent=2))
         return
 
+    # Book-independent screening in one pass over the scan: markets priced
+    # at extremes are dropped here, so their orderbooks are never fetched,
+    # and the YES+NO arbitrage check needs only Gamma prices
+    screened = [
+        (m, detect_arbitrage(m["prices"][0], m["prices"][1]))
+        for m in markets
+        if MIN_TRADABLE_PRICE <= m["prices"][0] <= MAX_TRADABLE_PRICE
+    ]
+
+    # Fetch YES-token orderbooks in parallel for the screened markets only
+    books = fetch_orderbooks([m["token_ids"][0] for m, _ in screened])
+
     # Score each market
     recommendations = []
     skipped = []
-    for market in markets:
-        result = score_market(market, portfolio)
+    for market, arb in screened:
+        result = score_market(
+            market, portfolio, books.get(market["token_ids"][0]), arb
+        )
         if result is None:
             continue
         if result.get("skipped"):
@@ -563,11 +679,10 @@ def main():
         else:
             recommendations.append(result)
 
-    # Sort by expected value descending
-    recommendations.sort(key=lambda r: r["expected_value"], reverse=True)
-
-    # Take top N
-    top_recs = recommendations[:args.top]
+    # Top N by expected value, descending
+    top_recs = heapq.nlargest(
+        args.top, recommendations, key=itemgetter("expected_value")
+    )
 
     output = {
         "generated_at": datetime.now(timezone.utc).isoformat(),
@@ -586,7 +701,7 @@ def main():
     if skipped:
         output["skipped_trades"] = skipped[:5]
 
-    print(json.dumps(output, indent=2))
+    print(_json_dumps(output))
 
 
 if __name__ == "__main__":
@@ -13,18 +13,37 @@ Usage:
     python backtest.py --portfolio-db ~/.polymarket-paper/portfolio.db
     python backtest.py --days 7 --json
     python backtest.py --live-check
+    python backtest.py --no-live-prices --json
 """
 
 import argparse
+import http.client
 import json
 import math
 import os
+import re
 import sqlite3
-import statistics
+import ssl
 import sys
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from urllib.request import urlopen, Request
-from urllib.error import URLError, HTTPError
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# Optional faster JSON encoder for --json output
+try:
+    import orjson
+
+    def _json_dumps(obj):
+        """Indented JSON text for CLI output."""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    def _json_dumps(obj):
+        """Indented JSON text for CLI output."""
+        return json.dumps(obj, indent=2)
 
 
 # ---------------------------------------------------------------------------
@@ -35,6 +54,10 @@ DEFAULT_DB_PATH = os.path.expanduser("~/.polymarket-paper/portfolio.db")
 CLOB_API = "https://clob.polymarket.com"
 RISK_FREE_RATE = 0.045  # 4.5% annualized
 TRADING_DAYS_PER_YEAR = 365  # Prediction markets trade every day
+MAX_FETCH_WORKERS = 8  # concurrent CLOB requests when marking to market
+# Midpoints younger than this many seconds are reused; shares the paper
+# trader's knob and price_cache table (0 disables).
+PRICE_CACHE_TTL = float(os.environ.get("POLYMARKET_PRICE_CACHE_TTL", "10"))
 
 # Live-readiness thresholds (from CLAUDE.md Section 4)
 LIVE_MIN_CLOSED_TRADES = 20
@@ -69,32 +92,113 @@ STRATEGY_KEYWORDS = {
     "news": ["news", "breaking", "announcement", "event-driven", "headline"],
 }
 
+# One alternation per strategy, tried in STRATEGY_KEYWORDS order so the
+# first listed strategy still wins when several match.
+_STRATEGY_PATTERNS = [
+    (strategy, re.compile("|".join(map(re.escape, keywords))))
+    for strategy, keywords in STRATEGY_KEYWORDS.items()
+]
+
 
 # ---------------------------------------------------------------------------
 # HTTP helpers
 # ---------------------------------------------------------------------------
 
+_HTTP_HEADERS = {
+    "User-Agent": "polymarket-backtest/1.0",
+    "Connection": "keep-alive",
+}
+
+# Idle keep-alive HTTPS connections by host, so concurrent midpoint
+# fetches reuse sockets and TLS sessions instead of a handshake each.
+# A connection is used by one thread at a time.
+_ssl_context = None
+_http_pool = {}
+_http_pool_lock = threading.Lock()
+
+
+def _checkout_connection(host, timeout):
+    """Take an idle connection to host from the pool, or open a new one."""
+    global _ssl_context
+    with _http_pool_lock:
+        idle = _http_pool.get(host)
+        conn = idle.pop() if idle else None
+    if conn is None:
+        if _ssl_context is None:
+            _ssl_context = ssl.create_default_context()
+        return http.client.HTTPSConnection(
+            host, timeout=timeout, context=_ssl_context
+        )
+    conn.timeout = timeout
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout)
+    return conn
+
+
+def _checkin_connection(host, conn):
+    """Return a connection to the pool, closing it if the pool is full."""
+    with _http_pool_lock:
+        idle = _http_pool.setdefault(host, [])
+        if len(idle) < MAX_FETCH_WORKERS:
+            idle.append(conn)
+            return
+    conn.close()
+
+
 def _api_get(url, timeout=15):
     """GET JSON from a URL. Returns parsed JSON or None on failure."""
-    req = Request(url, headers={"User-Agent": "polymarket-backtest/1.0"})
-    try:
-        with urlopen(req, timeout=timeout) as resp:
-            return json.loads(resp.read().decode())
-    except (URLError, HTTPError, ValueError, OSError):
-        return None
+    parts = urlsplit(url)
+    host = parts.netloc
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    # A pooled connection may have been closed by the server while idle;
+    # retry once on a fresh connection before giving up.
+    for attempt in range(2):
+        conn = _checkout_connection(host, timeout)
+        try:
+            conn.request("GET", path, headers=_HTTP_HEADERS)
+            resp = conn.getresponse()
+            data = resp.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            if attempt == 0:
+                continue
+            return None
+        if resp.will_close:
+            conn.close()
+        else:
+            _checkin_connection(host, conn)
+        if resp.status >= 400:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+    return None
+
+
+_midpoint_cache = {}  # token_id -> (expires_at, price)
 
 
 def fetch_midpoint(token_id):
     """Fetch the current midpoint price for a CLOB token.
 
     Returns the midpoint as a float, or None if the request fails.
+    Successful lookups are reused for PRICE_CACHE_TTL seconds.
     """
+    now = time.time()
+    cached = _midpoint_cache.get(token_id)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
     data = _api_get(f"{CLOB_API}/midpoint?token_id={token_id}")
     if data and "mid" in data:
         try:
-            return float(data["mid"])
+            price = float(data["mid"])
         except (ValueError, TypeError):
             return None
+        if PRICE_CACHE_TTL > 0:
+            _midpoint_cache[token_id] = (now + PRICE_CACHE_TTL, price)
+        return price
     return None
 
 
@@ -109,8 +213,12 @@ def connect_db(db_path):
     """
     if not os.path.exists(db_path):
         return None
-    conn = sqlite3.connect(db_path)
+    uri = Path(os.path.abspath(db_path)).as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=134217728")
     return conn
 
 
@@ -128,7 +236,8 @@ def get_portfolio_id(conn, portfolio_name):
 def get_all_trades(conn, portfolio_id, since=None):
     """Fetch all trades for a portfolio, optionally filtered by date.
 
-    Returns a list of dicts sorted by executed_at ascending.
+    Returns a list of sqlite3.Row sorted by executed_at ascending; rows are
+    read-only and indexed by column name.
     """
     if since:
         rows = conn.execute(
@@ -142,7 +251,7 @@ def get_all_trades(conn, portfolio_id, since=None):
             "ORDER BY executed_at ASC",
             (portfolio_id,),
         ).fetchall()
-    return [dict(r) for r in rows]
+    return rows
 
 
 def get_open_positions(conn, portfolio_id):
@@ -152,7 +261,7 @@ def get_open_positions(conn, portfolio_id):
         "ORDER BY opened_at ASC",
         (portfolio_id,),
     ).fetchall()
-    return [dict(r) for r in rows]
+    return rows
 
 
 def get_closed_positions(conn, portfolio_id, since=None):
@@ -169,7 +278,28 @@ def get_closed_positions(conn, portfolio_id, since=None):
             "ORDER BY closed_at ASC",
             (portfolio_id,),
         ).fetchall()
-    return [dict(r) for r in rows]
+    return rows
+
+
+def load_cached_midpoints(conn, token_ids):
+    """Seed the midpoint cache from the paper trader's price_cache table.
+
+    Only entries fetched within PRICE_CACHE_TTL seconds are used. Databases
+    created before the table existed are skipped.
+    """
+    if PRICE_CACHE_TTL <= 0 or not token_ids:
+        return
+    placeholders = ",".join("?" * len(token_ids))
+    try:
+        rows = conn.execute(
+            f"SELECT token_id, price, fetched_at FROM price_cache "
+            f"WHERE token_id IN ({placeholders}) AND fetched_at > ?",
+            (*token_ids, time.time() - PRICE_CACHE_TTL),
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return
+    for token_id, price, fetched_at in rows:
+        _midpoint_cache[token_id] = (fetched_at + PRICE_CACHE_TTL, price)
 
 
 def get_daily_snapshots(conn, portfolio_id, since=None):
@@ -186,7 +316,7 @@ def get_daily_snapshots(conn, portfolio_id, since=None):
             "ORDER BY date ASC",
             (portfolio_id,),
         ).fetchall()
-    return [dict(r) for r in rows]
+    return rows
 
 
 # ---------------------------------------------------------------------------
@@ -202,25 +332,35 @@ def classify_strategy(reasoning):
     if not reasoning:
         return "unclassified"
     text = reasoning.lower()
-    for strategy, keywords in STRATEGY_KEYWORDS.items():
-        for kw in keywords:
-            if kw in text:
-                return strategy
+    for strategy, pattern in _STRATEGY_PATTERNS:
+        if pattern.search(text):
+            return strategy
     return "unclassified"
 
 
+def _parse_iso(value):
+    """Parse an ISO-8601 timestamp, or return None if it is missing/invalid."""
+    try:
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        return None
+
+
 def pair_trades(trades):
     """Match BUY trades with corresponding SELL trades to form round trips.
 
     A round trip is a sequence of BUY(s) followed by SELL(s) for the same
     (token_id, side) pair. We use FIFO matching.
 
+    Args:
+        trades: rows from get_all_trades (or mappings with the same columns).
+
     Returns:
         closed_trips: list of dicts with entry/exit details and P&L
         open_entries: list of dicts for positions that were bought but never sold
     """
     # Accumulate buys per (token_id, side) key
-    buy_queues = {}  # key -> list of {shares_remaining, price, reasoning, time}
+    buy_queues = {}  # key -> deque of {shares_remaining, price, reasoning, time}
     closed_trips = []
 
     for t in trades:
@@ -228,46 +368,48 @@ def pair_trades(trades):
         action = t["action"]
 
         if action == "BUY":
-            if key not in buy_queues:
-                buy_queues[key] = []
-            buy_queues[key].append({
+            queue = buy_queues.get(key)
+            if queue is None:
+                queue = buy_queues[key] = deque()
+            queue.append({
                 "shares_remaining": t["shares"],
                 "price": t["price"],
-                "fee": t.get("fee", 0),
-                "total_cost": t.get("total_cost", t["shares"] * t["price"]),
-                "reasoning": t.get("reasoning", ""),
+                "fee": t["fee"],
+                "reasoning": t["reasoning"],
                 "executed_at": t["executed_at"],
-                "market_question": t.get("market_question", ""),
+                "executed_dt": _parse_iso(t["executed_at"]),
+                "market_question": t["market_question"],
+                # Classified once here; reused by every fill of this buy
+                "strategy": classify_strategy(t["reasoning"]),
             })
 
         elif action in ("SELL", "CLOSE"):
-            if key not in buy_queues or not buy_queues[key]:
+            queue = buy_queues.get(key)
+            if not queue:
                 # Sell without a preceding buy — skip orphaned sell
                 continue
 
-            sell_shares = t["shares"]
+            sell_total = sell_shares = t["shares"]
             sell_price = t["price"]
-            sell_fee = t.get("fee", 0)
+            sell_fee = t["fee"]
             sell_time = t["executed_at"]
+            # Parsed once per trade; a buy may be matched by many sells
+            sell_dt = _parse_iso(sell_time)
 
             # FIFO match against queued buys
-            while sell_shares > 0.0001 and buy_queues[key]:
-                buy = buy_queues[key][0]
-                matched = min(sell_shares, buy["shares_remaining"])
+            while sell_shares > 0.0001 and queue:
+                buy = queue[0]
+                remaining = buy["shares_remaining"]
+                matched = min(sell_shares, remaining)
 
                 entry_price = buy["price"]
-                # Proportional entry fee
-                entry_fee = buy["fee"] * (matched / (buy["shares_remaining"]
-                                          + (buy["total_cost"] / buy["price"]
-                                             - buy["shares_remaining"])
-                                          if buy["shares_remaining"] > 0 else 1))
                 # Simplified: attribute fees proportionally
-                if buy["shares_remaining"] > 0:
-                    buy_fee_portion = buy["fee"] * (matched / buy["shares_remaining"])
+                if remaining > 0:
+                    buy_fee_portion = buy["fee"] * (matched / remaining)
                 else:
                     buy_fee_portion = 0
-                if t["shares"] > 0:
-                    sell_fee_portion = sell_fee * (matched / t["shares"])
+                if sell_total > 0:
+                    sell_fee_portion = sell_fee * (matched / sell_total)
                 else:
                     sell_fee_portion = 0
 
@@ -276,14 +418,12 @@ def pair_trades(trades):
 
                 # Calculate hold time
                 hold_hours = 0
-                try:
-                    entry_dt = datetime.fromisoformat(buy["executed_at"])
-                    exit_dt = datetime.fromisoformat(sell_time)
-                    hold_hours = (exit_dt - entry_dt).total_seconds() / 3600
-                except (ValueError, TypeError):
-                    pass
-
-                strategy = classify_strategy(buy["reasoning"])
+                entry_dt = buy["executed_dt"]
+                if entry_dt is not None and sell_dt is not None:
+                    try:
+                        hold_hours = (sell_dt - entry_dt).total_seconds() / 3600
+                    except TypeError:  # naive vs aware timestamps
+                        pass
 
                 closed_trips.append({
                     "token_id": key[0],
@@ -301,7 +441,7 @@ def pair_trades(trades):
                     "entry_time": buy["executed_at"],
                     "exit_time": sell_time,
                     "hold_hours": round(hold_hours, 1),
-                    "strategy": strategy,
+                    "strategy": buy["strategy"],
                     "reasoning": buy["reasoning"],
                 })
 
@@ -309,7 +449,7 @@ def pair_trades(trades):
                 sell_shares -= matched
 
                 if buy["shares_remaining"] < 0.0001:
-                    buy_queues[key].pop(0)
+                    queue.popleft()
 
     # Collect remaining open entries
     open_entries = []
@@ -324,7 +464,7 @@ def pair_trades(trades):
                     "shares": round(buy["shares_remaining"], 4),
                     "cost_basis": round(buy["price"] * buy["shares_remaining"], 4),
                     "entry_time": buy["executed_at"],
-                    "strategy": classify_strategy(buy["reasoning"]),
+                    "strategy": buy["strategy"],
                     "reasoning": buy["reasoning"],
                 })
 
@@ -361,35 +501,54 @@ def compute_core_metrics(closed_trips):
             "total_fees": 0.0,
         }
 
-    pnls = [t["pnl"] for t in closed_trips]
-    winners = [p for p in pnls if p > 0]
-    losers = [p for p in pnls if p < 0]
-    breakevens = [p for p in pnls if p == 0]
-    hold_hours = [t["hold_hours"] for t in closed_trips if t["hold_hours"] > 0]
-    returns = [t["return_pct"] for t in closed_trips]
-    fees = [t["entry_fee"] + t["exit_fee"] for t in closed_trips]
-
-    gross_profit = sum(winners)
-    gross_loss = abs(sum(losers))
+    # Single pass; sums accumulate in trip order, as sum() over lists would
+    n = len(closed_trips)
+    n_win = n_lose = n_be = n_hold = 0
+    total_pnl = gross_profit = loss_sum = 0
+    total_return = total_hold = total_fees = 0
+    largest_winner = largest_loser = None
+
+    for t in closed_trips:
+        p = t["pnl"]
+        total_pnl += p
+        if p > 0:
+            n_win += 1
+            gross_profit += p
+            if largest_winner is None or p > largest_winner:
+                largest_winner = p
+        elif p < 0:
+            n_lose += 1
+            loss_sum += p
+            if largest_loser is None or p < largest_loser:
+                largest_loser = p
+        elif p == 0:
+            n_be += 1
+        if t["hold_hours"] > 0:
+            n_hold += 1
+            total_hold += t["hold_hours"]
+        total_return += t["return_pct"]
+        total_fees += t["entry_fee"] + t["exit_fee"]
+
+    gross_loss = abs(loss_sum)
 
     return {
-        "total_closed_trades": len(closed_trips),
-        "winners": len(winners),
-        "losers": len(losers),
-        "breakeven": len(breakevens),
-        "win_rate": round(len(winners) / len(closed_trips), 4) if closed_trips else 0,
-        "total_pnl": round(sum(pnls), 2),
-        "avg_pnl": round(sum(pnls) / len(pnls), 2),
-        "avg_winner": round(gross_profit / len(winners), 2) if winners else 0,
-        "avg_loser": round(sum(losers) / len(losers), 2) if losers else 0,
-        "largest_winner": round(max(winners), 2) if winners else 0,
-        "largest_loser": round(min(losers), 2) if losers else 0,
+        "total_closed_trades": n,
+        "winners": n_win,
+        "losers": n_lose,
+        "breakeven": n_be,
+        "win_rate": round(n_win / n, 4),
+        "total_pnl": round(total_pnl, 2),
+        "avg_pnl": round(total_pnl / n, 2),
+        "avg_winner": round(gross_profit / n_win, 2) if n_win else 0,
+        "avg_loser": round(loss_sum / n_lose, 2) if n_lose else 0,
+        "largest_winner": round(largest_winner, 2) if n_win else 0,
+        "largest_loser": round(largest_loser, 2) if n_lose else 0,
         "gross_profit": round(gross_profit, 2),
         "gross_loss": round(gross_loss, 2),
         "profit_factor": round(gross_profit / gross_loss, 4) if gross_loss > 0 else float("inf"),
-        "avg_return_pct": round(sum(returns) / len(returns), 2) if returns else 0,
-        "avg_hold_hours": round(sum(hold_hours) / len(hold_hours), 1) if hold_hours else 0,
-        "total_fees": round(sum(fees), 4),
+        "avg_return_pct": round(total_return / n, 2),
+        "avg_hold_hours": round(total_hold / n_hold, 1) if n_hold else 0,
+        "total_fees": round(total_fees, 4),
     }
 
 
@@ -411,28 +570,29 @@ def compute_drawdown(snapshots, starting_balance):
             "trough_date": None,
         }
 
-    values = [(s["date"], float(s["total_value"])) for s in snapshots]
-    peak = values[0][1]
-    peak_date = values[0][0]
+    # One pass: the running peak ends as the overall peak, and the last
+    # value seen is the current value.
+    peak = float(snapshots[0]["total_value"])
+    peak_date = snapshots[0]["date"]
     max_dd = 0.0
     max_dd_usd = 0.0
     trough_value = peak
     trough_date = peak_date
+    v = peak
 
-    for date, v in values:
+    for s in snapshots:
+        v = float(s["total_value"])
         if v > peak:
             peak = v
-            peak_date = date
-        dd = (peak - v) / peak if peak > 0 else 0
-        dd_usd = peak - v
-        if dd > max_dd:
-            max_dd = dd
-            max_dd_usd = dd_usd
+            peak_date = s["date"]
+        elif peak > 0 and (peak - v) / peak > max_dd:
+            max_dd = (peak - v) / peak
+            max_dd_usd = peak - v
             trough_value = v
-            trough_date = date
+            trough_date = s["date"]
 
-    current_value = values[-1][1]
-    overall_peak = max(v for _, v in values)
+    current_value = v
+    overall_peak = peak
     current_dd = (overall_peak - current_value) / overall_peak if overall_peak > 0 else 0
     current_dd_usd = overall_peak - current_value
 
@@ -459,23 +619,27 @@ def compute_sharpe_ratio(snapshots, starting_balance):
     if len(snapshots) < 2:
         return 0.0
 
-    values = [float(s["total_value"]) for s in snapshots]
-    daily_returns = []
-    for i in range(1, len(values)):
-        if values[i - 1] > 0:
-            daily_returns.append((values[i] - values[i - 1]) / values[i - 1])
-
-    if not daily_returns:
-        return 0.0
-
+    # One pass over consecutive snapshot pairs: daily excess returns feed
+    # Welford's running mean / sum of squared deviations directly.
     daily_rf = RISK_FREE_RATE / TRADING_DAYS_PER_YEAR
-    excess_returns = [r - daily_rf for r in daily_returns]
-
-    mean_excess = statistics.mean(excess_returns)
-    if len(excess_returns) < 2:
+    n = 0
+    mean_excess = 0.0
+    m2 = 0.0
+    prev = float(snapshots[0]["total_value"])
+    for s in snapshots[1:]:
+        v = float(s["total_value"])
+        if prev > 0:
+            x = (v - prev) / prev - daily_rf
+            n += 1
+            delta = x - mean_excess
+            mean_excess += delta / n
+            m2 += delta * (x - mean_excess)
+        prev = v
+
+    if n < 2:
         return 0.0
 
-    std_dev = statistics.stdev(excess_returns)
+    std_dev = math.sqrt(m2 / (n - 1))
     if std_dev == 0:
         return float("inf") if mean_excess > 0 else 0.0
 
@@ -494,9 +658,12 @@ def compute_total_return(starting_balance, current_value):
 # Mark-to-market for open positions
 # ---------------------------------------------------------------------------
 
-def mark_to_market(open_positions):
+def mark_to_market(open_positions, use_live=True):
     """Fetch live prices for open positions and calculate unrealized P&L.
 
+    With use_live=False no HTTP requests are made and every position is
+    valued at its stored current_price (price_source "cached").
+
     Returns a list of position dicts with current_price and unrealized_pnl
     added, plus a summary dict.
     """
@@ -505,18 +672,27 @@ def mark_to_market(open_positions):
     total_market_value = 0.0
     fetch_errors = 0
 
+    # Fetch every distinct token's midpoint concurrently up front
+    token_ids = list(dict.fromkeys(pos["token_id"] for pos in open_positions))
+    live_prices = dict.fromkeys(token_ids)
+    if token_ids and use_live:
+        workers = min(MAX_FETCH_WORKERS, len(token_ids))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            live_prices = dict(zip(token_ids, pool.map(fetch_midpoint, token_ids)))
+
     for pos in open_positions:
         token_id = pos["token_id"]
         entry_price = pos["avg_entry"]
         shares = pos["shares"]
 
-        live_price = fetch_midpoint(token_id)
+        live_price = live_prices[token_id]
         if live_price is not None:
             current_price = live_price
         else:
             # Fall back to the stored current_price from the DB
-            current_price = pos.get("current_price", entry_price)
-            fetch_errors += 1
+            current_price = pos["current_price"]
+            if use_live:
+                fetch_errors += 1
 
         market_value = shares * current_price
         unrealized_pnl = (current_price - entry_price) * shares
@@ -535,7 +711,7 @@ def mark_to_market(open_positions):
         marked.append({
             "token_id": token_id,
             "side": pos["side"],
-            "market_question": pos.get("market_question", ""),
+            "market_question": pos["market_question"],
             "shares": shares,
             "entry_price": entry_price,
             "current_price": round(current_price, 6),
@@ -567,19 +743,15 @@ def compute_strategy_breakdown(closed_trips):
 
     Returns a dict mapping strategy name to metrics dict.
     """
-    by_strategy = {}
+    by_strategy = defaultdict(list)
     for trip in closed_trips:
-        strategy = trip["strategy"]
-        if strategy not in by_strategy:
-            by_strategy[strategy] = []
-        by_strategy[strategy].append(trip)
-
-    breakdown = {}
-    for strategy, trips in sorted(by_strategy.items()):
-        metrics = compute_core_metrics(trips)
-        breakdown[strategy] = metrics
+        by_strategy[trip["strategy"]].append(trip)
 
-    return breakdown
+    # Only strategies that have trips, in name order
+    return {
+        strategy: compute_core_metrics(by_strategy[strategy])
+        for strategy in sorted(by_strategy)
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -610,9 +782,8 @@ def check_risk_compliance(closed_trips, open_positions, snapshots,
 
     # Check drawdown thresholds
     if snapshots:
-        values = [float(s["total_value"]) for s in snapshots]
-        peak = max(values)
-        current = values[-1]
+        peak = max(float(s["total_value"]) for s in snapshots)
+        current = float(snapshots[-1]["total_value"])
         if peak > 0:
             dd = (peak - current) / peak
             if dd >= RISK_LIMITS["drawdown_halt_pct"]:
@@ -645,11 +816,12 @@ def check_risk_compliance(closed_trips, open_positions, snapshots,
 
     # Check per-trade size violations in historical trades
     oversized_count = 0
-    for trip in closed_trips:
-        if portfolio_value > 0:
-            size_pct = trip["cost_basis"] / portfolio_value
-            if size_pct > RISK_LIMITS["max_position_pct_arbitrage"]:
-                oversized_count += 1
+    if portfolio_value > 0:
+        max_pct = RISK_LIMITS["max_position_pct_arbitrage"]
+        oversized_count = sum(
+            1 for trip in closed_trips
+            if trip["cost_basis"] / portfolio_value > max_pct
+        )
 
     if oversized_count > 0:
         violations.append({
@@ -928,9 +1100,13 @@ def format_human_readable(result):
 # Main backtest pipeline
 # ---------------------------------------------------------------------------
 
-def run_backtest(db_path, portfolio_name="default", days=None):
+def run_backtest(db_path, portfolio_name="default", days=None,
+                 use_live_prices=True):
     """Execute the full backtest pipeline.
 
+    use_live_prices=False values open positions at their stored prices
+    without any network calls (for repeated runs such as parameter sweeps).
+
     Returns a structured dict with all metrics and assessments.
     """
     conn = connect_db(db_path)
@@ -963,10 +1139,18 @@ def run_backtest(db_path, portfolio_name="default", days=None):
     if days is not None:
         since = datetime.now(timezone.utc) - timedelta(days=days)
 
-    # Load data
+    # Load data in one read transaction: a consistent snapshot, and the
+    # WAL read lock is taken once rather than per query. The ORDER BYs are
+    # served by the paper trader's (portfolio_id, executed_at) and
+    # (portfolio_id, date) indexes.
+    conn.execute("BEGIN")
     all_trades = get_all_trades(conn, portfolio_id, since)
     open_positions = get_open_positions(conn, portfolio_id)
     snapshots = get_daily_snapshots(conn, portfolio_id, since)
+    if use_live_prices:
+        load_cached_midpoints(
+            conn, list(dict.fromkeys(pos["token_id"] for pos in open_positions))
+        )
 
     conn.close()
 
@@ -977,7 +1161,9 @@ def run_backtest(db_path, portfolio_name="default", days=None):
     core_metrics = compute_core_metrics(closed_trips)
 
     # Mark open positions to market
-    marked_positions, open_summary = mark_to_market(open_positions)
+    marked_positions, open_summary = mark_to_market(
+        open_positions, use_live=use_live_prices
+    )
 
     # Current portfolio value
     positions_value = open_summary["total_market_value"]
@@ -1038,6 +1224,20 @@ def run_backtest(db_path, portfolio_name="default", days=None):
 # CLI
 # ---------------------------------------------------------------------------
 
+def _sanitize(obj):
+    """Replace inf/NaN floats with strings so the output is valid JSON."""
+    if isinstance(obj, float):
+        if math.isinf(obj):
+            return "Infinity" if obj > 0 else "-Infinity"
+        if math.isnan(obj):
+            return "NaN"
+    if isinstance(obj, dict):
+        return {k: _sanitize(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_sanitize(v) for v in obj]
+    return obj
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Backtest Polymarket paper trading strategies",
@@ -1050,6 +1250,7 @@ Examples:
   %(prog)s --json
   %(prog)s --live-check
   %(prog)s --portfolio mytest --days 30 --json
+  %(prog)s --no-live-prices --json
         """,
     )
     parser.add_argument(
@@ -1072,6 +1273,10 @@ Examples:
         "--live-check", action="store_true",
         help="Only show the live-readiness assessment",
     )
+    parser.add_argument(
+        "--no-live-prices", action="store_true",
+        help="Value open positions at stored prices; no API calls",
+    )
 
     args = parser.parse_args()
 
@@ -1079,12 +1284,13 @@ Examples:
         db_path=args.portfolio_db,
         portfolio_name=args.portfolio,
         days=args.days,
+        use_live_prices=not args.no_live_prices,
     )
 
     # Handle errors
     if "error" in result:
         if args.json:
-            print(json.dumps(result, indent=2))
+            print(_json_dumps(result))
         else:
             print(f"ERROR: {result['error']}", file=sys.stderr)
             print(f"Suggestion: {result['suggestion']}", file=sys.stderr)
@@ -1094,7 +1300,7 @@ Examples:
     if args.live_check:
         lr = result["live_readiness"]
         if args.json:
-            print(json.dumps(lr, indent=2))
+            print(_json_dumps(_sanitize(lr)))
         else:
             verdict = lr["verdict"]
             print(f"\nLive-Readiness Assessment: {verdict}")
@@ -1115,20 +1321,7 @@ Examples:
 
     # Full output
     if args.json:
-        # Convert inf to string for JSON serialization
-        def sanitize(obj):
-            if isinstance(obj, float):
-                if math.isinf(obj):
-                    return "Infinity" if obj > 0 else "-Infinity"
-                if math.isnan(obj):
-                    return "NaN"
-            if isinstance(obj, dict):
-                return {k: sanitize(v) for k, v in obj.items()}
-            if isinstance(obj, list):
-                return [sanitize(v) for v in obj]
-            return obj
-
-        print(json.dumps(sanitize(result), indent=2))
+        print(_json_dumps(_sanitize(result)))
     else:
         print(format_human_readable(result))
 
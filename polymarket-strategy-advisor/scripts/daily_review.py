@@ -15,18 +15,27 @@ import math
 import os
 import sqlite3
 import sys
+from collections import defaultdict
 from datetime import datetime, timedelta, timezone
+from pathlib import Path
 
 
 DEFAULT_DB_PATH = os.path.expanduser("~/.polymarket-paper/portfolio.db")
 
 
 def connect_db(db_path):
-    """Connect to the paper trader database. Returns None if not found."""
+    """Open a read-only connection to the paper trader database.
+
+    Returns None if not found.
+    """
     if not os.path.exists(db_path):
         return None
-    conn = sqlite3.connect(db_path)
+    uri = Path(os.path.abspath(db_path)).as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=134217728")
     return conn
 
 
@@ -34,13 +43,24 @@ def get_closed_trades(conn, since_date):
     """Fetch all closed (SELL) trades since a given date.
 
     The paper_engine schema stores BUY and SELL as separate trade rows.
-    A 'closed' trade is a SELL action. We join with the position to get
-    entry price for P&L calculation.
+    A 'closed' trade is a SELL action. We join with the latest BUY of the
+    same token to get entry price for P&L calculation.
     """
     try:
         cur = conn.cursor()
         cur.execute(
             """
+            WITH last_buy AS (
+                -- Latest BUY per token, ranked in one pass over the BUYs
+                -- instead of a correlated lookup per SELL row
+                SELECT token_id, portfolio_id, price,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY token_id, portfolio_id
+                           ORDER BY executed_at DESC, id DESC
+                       ) as rn
+                FROM trades
+                WHERE action = 'BUY'
+            )
             SELECT
                 t.market_question,
                 t.side,
@@ -52,35 +72,38 @@ def get_closed_trades(conn, since_date):
                 t.reasoning,
                 t.executed_at as closed_at,
                 -- Calculate realized P&L: for SELL trades, profit = (sell_price - avg_entry) * shares
-                COALESCE(
-                    (SELECT b.price FROM trades b
-                     WHERE b.token_id = t.token_id AND b.action = 'BUY'
-                     AND b.portfolio_id = t.portfolio_id
-                     ORDER BY b.executed_at DESC LIMIT 1),
-                    t.price
-                ) as entry_price
+                COALESCE(lb.price, t.price) as entry_price
             FROM trades t
+            LEFT JOIN last_buy lb
+              ON lb.token_id = t.token_id
+             AND lb.portfolio_id = t.portfolio_id
+             AND lb.rn = 1
             WHERE t.action = 'SELL'
               AND t.executed_at >= ?
             ORDER BY t.executed_at DESC
             """,
             (since_date.isoformat(),),
         )
-        rows = [dict(row) for row in cur.fetchall()]
-        # Calculate realized P&L for each trade
-        for r in rows:
-            entry = float(r.get("entry_price", 0))
-            exit_p = float(r.get("exit_price", 0))
-            shares = float(r.get("shares", 0))
-            fee = float(r.get("fee", 0))
+        # Stream the cursor and calculate realized P&L for each trade as
+        # it is converted, rather than materializing a Row list first.
+        # Numeric fields are cast to float once here so downstream code
+        # can use them directly.
+        rows = []
+        for row in cur:
+            r = dict(row)
+            entry = r["entry_price"] = float(r["entry_price"])
+            exit_p = r["exit_price"] = float(r["exit_price"])
+            shares = r["shares"] = float(r["shares"])
+            fee = r["fee"] = float(r["fee"])
             r["realized_pnl"] = round((exit_p - entry) * shares - fee, 4)
+            rows.append(r)
         return rows
     except sqlite3.OperationalError:
         return []
 
 
 def get_open_positions(conn):
-    """Fetch currently open positions."""
+    """Fetch currently open positions as sqlite3.Row records."""
     try:
         cur = conn.cursor()
         cur.execute(
@@ -98,13 +121,17 @@ def get_open_positions(conn):
             ORDER BY opened_at DESC
             """
         )
-        return [dict(row) for row in cur.fetchall()]
+        return cur.fetchall()
     except sqlite3.OperationalError:
         return []
 
 
 def get_account_history(conn, since_date):
-    """Fetch portfolio value history from daily_snapshots."""
+    """Fetch portfolio value history from daily_snapshots.
+
+    Rows are returned as sqlite3.Row records (indexable by column name)
+    rather than copied into dicts.
+    """
     try:
         cur = conn.cursor()
         cur.execute(
@@ -116,13 +143,13 @@ def get_account_history(conn, since_date):
             """,
             (since_date.strftime("%Y-%m-%d"),),
         )
-        return [dict(row) for row in cur.fetchall()]
+        return cur.fetchall()
     except sqlite3.OperationalError:
         return []
 
 
 def compute_metrics(trades):
-    """Compute performance metrics from a list of closed trades."""
+    """Compute performance metrics from get_closed_trades() rows."""
     if not trades:
         return {
             "total_trades": 0,
@@ -139,41 +166,54 @@ def compute_metrics(trades):
             "avg_hold_time_hours": 0.0,
         }
 
-    pnls = [float(t.get("realized_pnl", 0)) for t in trades]
-    winners = [p for p in pnls if p > 0]
-    losers = [p for p in pnls if p < 0]
-    total_pnl = sum(pnls)
-
-    gross_profit = sum(winners) if winners else 0
-    gross_loss = abs(sum(losers)) if losers else 0
-
-    # Hold time calculation
-    hold_times = []
+    # Single pass with running accumulators instead of separate
+    # winner/loser lists and sum/max/min scans over them
+    n_winners = n_losers = n_holds = 0
+    total_pnl = gross_profit = loser_sum = hold_total = 0.0
+    largest_winner = largest_loser = 0.0
     for t in trades:
+        pnl = t["realized_pnl"]
+        total_pnl += pnl
+        if pnl > 0:
+            n_winners += 1
+            gross_profit += pnl
+            if pnl > largest_winner:
+                largest_winner = pnl
+        elif pnl < 0:
+            n_losers += 1
+            loser_sum += pnl
+            if pnl < largest_loser:
+                largest_loser = pnl
+
+        # Hold time calculation
         opened = t.get("opened_at", "")
         closed = t.get("closed_at", "")
         if opened and closed:
             try:
                 o = datetime.fromisoformat(opened)
                 c = datetime.fromisoformat(closed)
-                hold_times.append((c - o).total_seconds() / 3600)
+                hold_total += (c - o).total_seconds() / 3600
+                n_holds += 1
             except (ValueError, TypeError):
                 pass
 
+    n_trades = len(trades)
+    gross_loss = abs(loser_sum) if n_losers else 0
+
     return {
-        "total_trades": len(trades),
-        "winners": len(winners),
-        "losers": len(losers),
-        "breakeven": len(trades) - len(winners) - len(losers),
-        "win_rate": len(winners) / len(trades) if trades else 0,
+        "total_trades": n_trades,
+        "winners": n_winners,
+        "losers": n_losers,
+        "breakeven": n_trades - n_winners - n_losers,
+        "win_rate": n_winners / n_trades,
         "total_pnl": round(total_pnl, 2),
-        "avg_pnl": round(total_pnl / len(trades), 2) if trades else 0,
-        "avg_winner": round(gross_profit / len(winners), 2) if winners else 0,
-        "avg_loser": round(sum(losers) / len(losers), 2) if losers else 0,
-        "largest_winner": round(max(winners), 2) if winners else 0,
-        "largest_loser": round(min(losers), 2) if losers else 0,
+        "avg_pnl": round(total_pnl / n_trades, 2),
+        "avg_winner": round(gross_profit / n_winners, 2) if n_winners else 0,
+        "avg_loser": round(loser_sum / n_losers, 2) if n_losers else 0,
+        "largest_winner": round(largest_winner, 2) if n_winners else 0,
+        "largest_loser": round(largest_loser, 2) if n_losers else 0,
         "profit_factor": round(gross_profit / gross_loss, 2) if gross_loss > 0 else float("inf"),
-        "avg_hold_time_hours": round(sum(hold_times) / len(hold_times), 1) if hold_times else 0,
+        "avg_hold_time_hours": round(hold_total / n_holds, 1) if n_holds else 0,
     }
 
 
@@ -182,16 +222,21 @@ def compute_drawdown(account_history):
     if not account_history:
         return {"max_drawdown_pct": 0, "current_drawdown_pct": 0}
 
-    values = [float(h["portfolio_value"]) for h in account_history]
-    peak = values[0]
+    # Single pass: the running peak ends up as the overall peak, so the
+    # current drawdown needs no second scan over the history.
+    peak = float(account_history[0]["portfolio_value"])
     max_dd = 0
-    for v in values:
-        peak = max(peak, v)
-        dd = (peak - v) / peak if peak > 0 else 0
-        max_dd = max(max_dd, dd)
-
-    current_peak = max(values)
-    current_dd = (current_peak - values[-1]) / current_peak if current_peak > 0 else 0
+    v = peak
+    for h in account_history:
+        v = float(h["portfolio_value"])
+        if v > peak:
+            peak = v
+        elif peak > 0:
+            dd = (peak - v) / peak
+            if dd > max_dd:
+                max_dd = dd
+
+    current_dd = (peak - v) / peak if peak > 0 else 0
 
     return {
         "max_drawdown_pct": round(max_dd * 100, 2),
@@ -201,18 +246,14 @@ def compute_drawdown(account_history):
 
 def breakdown_by_strategy(trades):
     """Break down metrics by edge_type."""
-    strategies = {}
+    strategies = defaultdict(list)
     for t in trades:
-        edge_type = t.get("edge_type", "unknown") or "unknown"
-        if edge_type not in strategies:
-            strategies[edge_type] = []
-        strategies[edge_type].append(t)
+        strategies[t.get("edge_type", "unknown") or "unknown"].append(t)
 
-    result = {}
-    for strategy, strades in strategies.items():
-        result[strategy] = compute_metrics(strades)
-
-    return result
+    return {
+        strategy: compute_metrics(strades)
+        for strategy, strades in strategies.items()
+    }
 
 
 def generate_suggestions(metrics, strategy_breakdown, drawdown, open_positions):
@@ -324,9 +365,9 @@ def format_review(metrics, strategy_breakdown, drawdown, open_positions,
             "market": t.get("market_question", ""),
             "side": t.get("side", ""),
             "edge_type": t.get("edge_type", ""),
-            "pnl": float(t.get("realized_pnl", 0)),
-            "entry": float(t.get("entry_price", 0)),
-            "exit": float(t.get("exit_price", 0)),
+            "pnl": t["realized_pnl"],
+            "entry": t["entry_price"],
+            "exit": t["exit_price"],
             "closed_at": t.get("closed_at", ""),
         })
     if recent:
@@ -384,9 +425,13 @@ def main():
 
     since = datetime.now(timezone.utc) - timedelta(days=args.days)
 
+    # One read transaction: the three queries see a consistent snapshot
+    # and the WAL read lock is taken once.
+    conn.execute("BEGIN")
     trades = get_closed_trades(conn, since)
     open_positions = get_open_positions(conn)
     account_history = get_account_history(conn, since)
+    conn.close()
 
     metrics = compute_metrics(trades)
     strategy_breakdown = breakdown_by_strategy(trades)
@@ -400,7 +445,6 @@ def main():
         suggestions, args.days, trades,
     )
 
-    conn.close()
     print(json.dumps(output, indent=2))
 
 